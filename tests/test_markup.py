@@ -0,0 +1,62 @@
+from markup import parse_paragraph, SpanStyle, ANSI_COLORS
+
+
+def test_plain_text_has_no_spans():
+    styled = parse_paragraph("just [text]", True)
+    assert styled.text == "just [text]"
+    assert styled.spans == ()
+
+
+def test_tags():
+    styled = parse_paragraph("a [b]bold[/b] [color=red]red[/color] z", True)
+    assert styled.text == "a bold red z"
+    assert styled.spans == (
+        (2, 4, SpanStyle(bold=True)),
+        (7, 3, SpanStyle(fg="red")),
+    )
+
+
+def test_nested_colors_restore_the_outer_one():
+    styled = parse_paragraph("[color=red]a[color=blue]b[/color]c[/color]d", True)
+    assert styled.text == "abcd"
+    assert styled.spans == (
+        (0, 1, SpanStyle(fg="red")),
+        (1, 1, SpanStyle(fg="blue")),
+        (2, 1, SpanStyle(fg="red")),
+    )
+
+
+def test_unmatched_closing_tag_stays_text():
+    styled = parse_paragraph("a[/color]b", True)
+    assert styled.text == "a[/color]b"
+    assert styled.spans == ()
+
+
+def test_markup_off_keeps_tags():
+    styled = parse_paragraph("[b]bold[/b]", False)
+    assert styled.text == "[b]bold[/b]"
+    assert styled.spans == ()
+
+
+def test_ansi_colors():
+    styled = parse_paragraph("\x1b[31mred\x1b[0m plain \x1b[1;92mbright\x1b[0m")
+    assert styled.text == "red plain bright"
+    assert styled.spans == (
+        (0, 3, SpanStyle(fg=ANSI_COLORS[1])),
+        (10, 6, SpanStyle(fg=ANSI_COLORS[10], bold=True)),
+    )
+
+
+def test_other_escape_sequences_are_dropped():
+    styled = parse_paragraph("\x1b[2Ka\x1b[?25lb")
+    assert styled.text == "ab"
+    assert styled.spans == ()
+
+
+def test_segments_cover_the_range():
+    styled = parse_paragraph("a [b]bold[/b] z", True)
+    assert list(styled.segments(0, len(styled.text))) == [
+        (0, 2, None),
+        (2, 6, SpanStyle(bold=True)),
+        (6, 8, None),
+    ]
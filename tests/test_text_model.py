@@ -0,0 +1,36 @@
+import pytest
+from text_model import TextModel
+
+
+def changes_of(model, text):
+    changes = []
+    model.changed.connect(lambda *change: changes.append(change))
+    changed = model.set_text(text)
+    return changed, changes
+
+
+@pytest.mark.parametrize("old, new, change", [
+    ("a\nb\nc", "a\nB\nc", (1, 1, 1)),
+    ("a\nb\nc", "a\nb\nc\nd", (3, 0, 1)),
+    ("a\nb\nc", "x\na\nb\nc", (0, 0, 1)),
+    ("a\nb\nc", "a\nc", (1, 1, 0)),
+    ("a\nb\nc", "a\nx\ny\nc", (1, 1, 2)),
+    ("a\nb\nb\nc", "a\nb\nc", (2, 1, 0)),
+    ("a", "", (0, 1, 1)),
+    ("", "a\nb", (0, 1, 2)),
+])
+def test_set_text_reports_changed_range(old, new, change):
+    model = TextModel(old)
+    changed, changes = changes_of(model, new)
+    assert changed
+    assert changes == [change]
+    assert model.lines == new.split("\n")
+    assert model.version == 1
+
+
+def test_set_text_same_text_changes_nothing():
+    model = TextModel("a\nb")
+    changed, changes = changes_of(model, "a\nb")
+    assert not changed
+    assert changes == []
+    assert model.version == 0
@@ -0,0 +1,23 @@
+import pytest
+from update_recorder import text_delta, apply_delta
+
+
+@pytest.mark.parametrize("old, new", [
+    ("", ""),
+    ("", "abc"),
+    ("abc", ""),
+    ("abc", "abc"),
+    ("hello world", "hello there world"),
+    ("line 1\nline 2\n", "line 1\nline 2\nline 3\n"),
+    ("aaaa", "aa"),
+    ("abab", "ab"),
+    ("x\ny", "y\nx"),
+])
+def test_delta_round_trip(old, new):
+    prefix, suffix, inserted = text_delta(old, new)
+    assert apply_delta(old, prefix, suffix, inserted) == new
+    assert prefix + suffix <= min(len(old), len(new))
+
+
+def test_delta_keeps_common_ends():
+    assert text_delta("hello world", "hello there world") == (6, 5, "there ")
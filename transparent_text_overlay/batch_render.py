@@ -0,0 +1,117 @@
+"""Renders text files, or snapshots from one file, to transparent PNG frames without a screen.
+
+    python batch_render.py notes.txt timers.txt --out frames
+    python batch_render.py --snapshots captions.txt --out frames --w 800 --h 200 --widget-type 1
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+SNAPSHOT_SEPARATOR = "\f"
+
+# per worker process, set up by init_worker
+_worker = None
+
+
+class FrameRenderer:
+    """Paints text with the overlay renderers into ARGB images at a fixed size."""
+    def __init__(self, overlay_config):
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import Qt
+        from config import initDisplaySettings
+        from render_cache import SharedCaches
+        from overlay.overlay_widget import create_text_widget
+
+        self.app = QApplication.instance() or QApplication(["batch_render"])
+        self.caches = SharedCaches()
+        self.displaySettings = initDisplaySettings(overlay_config, self.caches.fonts)
+        self.width = self.displaySettings.w
+        self.height = self.displaySettings.h
+
+        self.widget = create_text_widget(self.displaySettings.widgetType, None, "", self.displaySettings, self.caches)
+        self.widget.setAttribute(Qt.WA_TranslucentBackground)
+        self.widget.setStyleSheet("background-color: transparent; border: none;")
+        self.widget.viewport().setAutoFillBackground(False)
+        self.widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.widget.resize(self.width, self.height)
+
+    def render(self, text):
+        from PyQt5.QtGui import QImage
+        from PyQt5.QtCore import Qt
+
+        self.widget.setTYext(text)
+        self.widget.updateFont()
+        # no event loop turns here for progressive layout to continue in
+        self.widget.finish_layout()
+
+        image = QImage(self.width, self.height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        self.widget.render(image)
+        return image
+
+
+def init_worker(overlay_config):
+    global _worker
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    _worker = FrameRenderer(overlay_config)
+
+def render_frame(task):
+    index, text, out_path = task
+    if not _worker.render(text).save(out_path, "PNG"):
+        raise IOError(f"could not write {out_path}")
+    return index
+
+def read_frames(args):
+    if args.snapshots:
+        with open(args.snapshots, "r", encoding="utf-8") as f:
+            return [snapshot.strip("\n") for snapshot in f.read().split(args.separator)]
+
+    frames = []
+    for path in args.files:
+        with open(path, "r", encoding="utf-8") as f:
+            frames.append(f.read())
+    return frames
+
+def parse_args(argv):
+    from cli import add_overlay_arguments
+
+    parser = argparse.ArgumentParser(description="Render overlay text to transparent PNG frames")
+    parser.add_argument("files", nargs="*", help="text files, one frame each")
+    parser.add_argument("--snapshots", help="one file holding many frames separated by --separator")
+    parser.add_argument("--separator", default=SNAPSHOT_SEPARATOR, help="snapshot separator (default form feed)")
+    parser.add_argument("--out", default="frames", help="output directory")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    add_overlay_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv):
+    from config import load_config
+    from cli import selected_overlay_config
+
+    args = parse_args(argv)
+    overlay_config = selected_overlay_config(load_config(), args)
+
+    frames = read_frames(args)
+    if not frames:
+        print("Nothing to render, pass text files or --snapshots")
+        return 1
+
+    os.makedirs(args.out, exist_ok=True)
+    tasks = [(i, text, os.path.join(args.out, f"frame_{i:05d}.png")) for i, text in enumerate(frames)]
+    jobs = max(1, min(args.jobs or 1, len(tasks)))
+    chunksize = max(1, len(tasks) // (jobs * 4))
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(overlay_config,)) as pool:
+        rendered = sum(1 for _ in pool.map(render_frame, tasks, chunksize=chunksize))
+    elapsed = time.perf_counter() - t0
+
+    print(f"Rendered {rendered} frames to {args.out} with {jobs} processes in {elapsed:.2f} s ({rendered / elapsed:.1f} fps)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
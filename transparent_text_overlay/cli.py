@@ -0,0 +1,65 @@
+import argparse
+from models import ConfigProps
+from config import overlay_configs
+
+# command line flag -> per-overlay config key
+CLI_OVERRIDES = {
+    "x": ConfigProps.X,
+    "y": ConfigProps.Y,
+    "w": ConfigProps.W,
+    "h": ConfigProps.H,
+    "font": ConfigProps.FONT_NAME,
+    "font_size": ConfigProps.FONT_SIZE,
+    "color1": ConfigProps.COLOR1,
+    "color2": ConfigProps.COLOR2,
+    "widget_type": ConfigProps.TEXT_OVERLAY_TYPE,
+    "outline_size": ConfigProps.OUTLINE_SIZE,
+    "line_space": ConfigProps.LINE_SPACE,
+    "text_file": ConfigProps.TEXT_FILE_PATH,
+    "draggable": ConfigProps.DRAGGABLE,
+    "frame_output": ConfigProps.FRAME_OUTPUT,
+    "word_wrap": ConfigProps.WORD_WRAP,
+    "markup": ConfigProps.MARKUP,
+}
+
+def add_overlay_arguments(parser: argparse.ArgumentParser):
+    """Flags that override one overlay's geometry and style from the config."""
+    parser.add_argument("--x", type=int)
+    parser.add_argument("--y", type=int)
+    parser.add_argument("--w", type=int, help="width")
+    parser.add_argument("--h", type=int, help="height")
+    parser.add_argument("--font", help="font family")
+    parser.add_argument("--font-size", type=int)
+    parser.add_argument("--color1", help="text color, e.g. white or #ffffff")
+    parser.add_argument("--color2", help="outline color")
+    parser.add_argument("--widget-type", type=int, choices=[0, 1], help="0 simple, 1 outlined")
+    parser.add_argument("--outline-size", type=int)
+    parser.add_argument("--line-space", type=int)
+    parser.add_argument("--word-wrap", action=argparse.BooleanOptionalAction, default=None, help="wrap lines to the overlay width")
+    parser.add_argument("--markup", action=argparse.BooleanOptionalAction, default=None, help="[b] [i] [u] [color=..] [outline=..] tags")
+    parser.add_argument("--text-file", help="text file to show")
+    parser.add_argument("--draggable", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--frame-output", help="publish rendered frames to this memory-mapped file")
+    parser.add_argument("--overlay", type=int, default=0, help="index of the configured overlay the flags apply to")
+
+def cli_overrides(args):
+    """Config values of the flags that were passed"""
+    overrides = {}
+    for arg_name, prop in CLI_OVERRIDES.items():
+        value = getattr(args, arg_name)
+        if value is not None:
+            overrides[prop.value] = value
+    return overrides
+
+def apply_cli_overrides(overlay_config, args):
+    overlay_config.update(cli_overrides(args))
+
+def selected_overlay_index(config, args):
+    return min(max(args.overlay, 0), len(overlay_configs(config)) - 1)
+
+def selected_overlay_config(config, args):
+    """A copy of the overlay chosen with --overlay, with the flags applied; the loaded
+    config keeps what was saved."""
+    overlay_config = dict(overlay_configs(config)[selected_overlay_index(config, args)])
+    apply_cli_overrides(overlay_config, args)
+    return overlay_config
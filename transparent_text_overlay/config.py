@@ -0,0 +1,76 @@
+from __future__ import annotations
+import json
+import os
+from PyQt5.QtGui import QFont, QColor
+from models import ConfigProps, DisplaySettings
+
+CONFIG_FILE = "transparent_text_overlay_config.json"
+DEFAULT_TEXT_FILE_PATH = "text.txt"
+
+# keys that belong to the whole application, not to a single overlay
+GLOBAL_CONFIG_KEYS = (
+    "settings_x", "settings_y", ConfigProps.OVERLAYS.value,
+    ConfigProps.LAZY_STARTUP.value, ConfigProps.SHOW_SETTINGS_ON_START.value,
+    ConfigProps.MAX_FPS.value, ConfigProps.RECORD_UPDATES.value,
+)
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r") as f:
+            try:
+                return json.load(f)
+            except:
+                return json.loads("{}F")
+    return {}
+
+def save_config(config):
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(config, f, indent=4)
+
+def load_text(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return "No text loaded, use the settings window or put text to '"+path+"'"
+
+def save_text(content, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def overlay_configs(config):
+    """Per-overlay config dicts. A legacy single-overlay config is its own (only) overlay."""
+    overlays = config.get(ConfigProps.OVERLAYS.value)
+    if overlays is None:
+        return [config]
+    return overlays
+
+def split_overlay_configs(config):
+    """Moves a legacy single-overlay config into the overlays list, in place."""
+    if ConfigProps.OVERLAYS.value in config:
+        return config[ConfigProps.OVERLAYS.value]
+
+    first = {k: v for k, v in config.items() if k not in GLOBAL_CONFIG_KEYS}
+    for k in first:
+        del config[k]
+    config[ConfigProps.OVERLAYS.value] = [first]
+    return config[ConfigProps.OVERLAYS.value]
+
+def initDisplaySettings(config, fonts=None):
+    displaySettings = DisplaySettings()
+    displaySettings.color1 = QColor(config.get(ConfigProps.COLOR1.value, "white"))
+    displaySettings.color2 = QColor(config.get(ConfigProps.COLOR2.value, "black"))
+    font_name = config.get(ConfigProps.FONT_NAME.value, "Arial")
+    font_size = config.get(ConfigProps.FONT_SIZE.value, 16)
+    displaySettings.font = fonts.get(font_name, font_size) if fonts is not None else QFont(font_name, font_size)
+    displaySettings.lineSpace = config.get(ConfigProps.LINE_SPACE.value, 5)
+    displaySettings.x = config.get(ConfigProps.X.value, 100)
+    displaySettings.y = config.get(ConfigProps.Y.value, 100)
+    displaySettings.w = config.get(ConfigProps.W.value, 200)
+    displaySettings.h = config.get(ConfigProps.H.value, 600)
+    displaySettings.widgetType = config.get(ConfigProps.TEXT_OVERLAY_TYPE.value, 0)
+    displaySettings.outlineSize = config.get(ConfigProps.OUTLINE_SIZE.value, 2)
+    displaySettings.textFilePath = config.get(ConfigProps.TEXT_FILE_PATH.value, DEFAULT_TEXT_FILE_PATH)
+    displaySettings.templateFields = config.get(ConfigProps.TEMPLATE_FIELDS.value, True)
+    displaySettings.wordWrap = config.get(ConfigProps.WORD_WRAP.value, False)
+    displaySettings.markup = config.get(ConfigProps.MARKUP.value, False)
+    return displaySettings
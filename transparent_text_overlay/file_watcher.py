@@ -1,86 +1,128 @@
 import os
 from PyQt5.QtCore import QFileSystemWatcher, QTimer
 
+class FileWatcherMultiplexer:
+    """One QFileSystemWatcher for the whole process. Each changed path is read once
+    and the contents are handed to every FileWatcher subscribed to it."""
+    def __init__(self, delay_ms=200):
+        self.delay_ms = delay_ms
+        self.subscribers = {}
+        self.pending = set()
+        self._watcher = None
+
+    @property
+    def watcher(self):
+        # created on first use so startup does not pay for it
+        if self._watcher is None:
+            self._watcher = QFileSystemWatcher()
+            self._watcher.fileChanged.connect(self.on_file_changed)
+        return self._watcher
+
+    def subscribe(self, path, file_watcher):
+        key = os.path.abspath(path)
+        subscribers = self.subscribers.setdefault(key, [])
+        if file_watcher not in subscribers:
+            subscribers.append(file_watcher)
+        if key not in self.watcher.files():
+            self.watcher.addPath(key)
+
+    def unsubscribe(self, file_watcher):
+        for key, subscribers in list(self.subscribers.items()):
+            if file_watcher not in subscribers:
+                continue
+            subscribers.remove(file_watcher)
+            if not subscribers:
+                del self.subscribers[key]
+                self.watcher.removePath(key)
+
+    def on_file_changed(self, path):
+        key = os.path.abspath(path)
+
+        # editors that save by replacing the file make the watcher drop it
+        if key not in self.watcher.files() and os.path.exists(key):
+            self.watcher.addPath(key)
+
+        if key in self.pending:
+            return
+        self.pending.add(key)
+        QTimer.singleShot(self.delay_ms, lambda: self.poll(key))
+
+    def poll(self, key):
+        self.pending.discard(key)
+        subscribers = [w for w in self.subscribers.get(key, []) if not w.paused]
+        if not subscribers:
+            return
+
+        try:
+            with open(key, 'r', encoding='utf-8') as f:
+                contents = f.read()
+        except Exception as e:
+            print(f"FileWatcher: Error reading watched file: {e}")
+            return
+
+        for file_watcher in subscribers:
+            file_watcher.on_contents(contents)
+
+
 class FileWatcher:
-    def __init__(self, filepath, on_change_callback, last_contents, start=False):
+    def __init__(self, filepath, on_change_callback, last_contents, start=False, multiplexer: FileWatcherMultiplexer = None):
         self.filepath = filepath
         self.on_change_callback = on_change_callback
-        self.last_contents = last_contents
-        
+        # the text itself lives in the overlay's text model
+        self.last_hash = hash(last_contents)
+
         self.paused = False
-        
+        self.running = False
+        self.multiplexer = multiplexer if multiplexer is not None else FileWatcherMultiplexer()
+
         if start and not os.path.exists(filepath):
             print('FileWatcher: file does not exist, could not start')
-            self.running = False
             return
-            
-        
-        self.watcher = QFileSystemWatcher()
+
         if start:
             print('FileWatcher: watching file ' + filepath)
-            
             self.start(filepath)
-            self.running = True
-            
-            # self.poll_file()
-            
-        else: 
-            self.running = False
-            
-            
-
-        
+
     def pause(self):
         print('FileWatcher: pause')
         self.paused = True
-    
+
     def resume(self):
         print('FileWatcher: resume')
         self.paused = False
-    
+
     @property
     def isRunning(self):
         return self.running
-    
+
     def start(self, path):
         if self.running:
             self.stop()
-        
-        self.watcher.removePaths(self.watcher.files())
-        self.watcher.removePaths(self.watcher.directories())
-        self.watcher.addPath(path)
-        
+
         self.filepath = path
-        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.multiplexer.subscribe(path, self)
         self.running = True
         print('FileWatcher: started, path ' + path)
-        
+
     def stop(self):
-        if not self.running: 
+        if not self.running:
             return
-        self.watcher.fileChanged.disconnect(self.on_file_changed)
+        self.multiplexer.unsubscribe(self)
         self.running = False
         print('FileWatcher: stopped')
-        
-        
-    def on_file_changed(self, path):
-        print('FileWatcher: internal changed0')
-        
-        if self.paused:
-            return
-        
-        print('FileWatcher: internal changed')
-        QTimer.singleShot(200, self.poll_file)
 
     def poll_file(self):
         print('FileWatcher: poll')
-        
+
         try:
             with open(self.filepath, 'r', encoding='utf-8') as f:
                 contents = f.read()
-            print('c',contents != self.last_contents)
-            if contents != self.last_contents:
-                self.last_contents = contents
-                self.on_change_callback(contents)
+            self.on_contents(contents)
         except Exception as e:
             print(f"FileWatcher: Error reading watched file: {e}")
+
+    def on_contents(self, contents):
+        contents_hash = hash(contents)
+        if contents_hash != self.last_hash:
+            self.last_hash = contents_hash
+            self.on_change_callback(contents)
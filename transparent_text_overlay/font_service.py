@@ -0,0 +1,119 @@
+from __future__ import annotations
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QFont, QFontDatabase, QFontInfo, QFontMetricsF, QRawFont, QTextLayout
+
+WARMUP_SAMPLE = "The quick brown fox jumps over the lazy dog 0123456789"
+
+
+class FontService:
+    """Resolves font family names once and caches QFont, QFontMetricsF and QRawFont by
+    (resolved family, size, device pixel ratio). Fonts are handed out as copies under the
+    requested name, so callers may change them without touching the cache."""
+    def __init__(self):
+        self.families = None
+        self.resolved = {}
+        self.fonts = {}
+        self.metrics = {}
+        self.raw_fonts = {}
+        self.hits = 0
+        self.misses = 0
+        self.warmup_queue = []
+        self.reported = set()
+
+    def known_families(self):
+        if self.families is None:
+            self.families = {family.lower(): family for family in QFontDatabase().families()}
+        return self.families
+
+    def is_known_family(self, name):
+        return name.strip().lower() in self.known_families()
+
+    def resolve_family(self, name):
+        """Installed family for a free-text name; unknown names resolve to Qt's fallback.
+        Qt matches the one name, the family list is only loaded by report_unknown_families."""
+        family = self.resolved.get(name)
+        if family is None:
+            family = QFontInfo(QFont(name.strip())).family()
+            self.resolved[name] = family
+        return family
+
+    def report_unknown_families(self):
+        for name, family in self.resolved.items():
+            if name not in self.reported and not self.is_known_family(name):
+                print(f"FontService: font '{name}' not found, using '{family}'")
+            self.reported.add(name)
+
+    def key(self, family, size, dpr=1.0):
+        return (self.resolve_family(family), size, round(dpr, 2))
+
+    def cached_font(self, key):
+        font = self.fonts.get(key)
+        if font is None:
+            self.misses += 1
+            font = QFont(key[0], key[1])
+            self.fonts[key] = font
+        else:
+            self.hits += 1
+        return font
+
+    def get(self, family, size, dpr=1.0) -> QFont:
+        """The font under the requested family name, which the settings show and save; Qt
+        falls back to the same family the cache is keyed by."""
+        font = QFont(self.cached_font(self.key(family, size, dpr)))
+        font.setFamily(family)
+        return font
+
+    def font_metrics(self, family, size, dpr=1.0) -> QFontMetricsF:
+        key = self.key(family, size, dpr)
+        metrics = self.metrics.get(key)
+        if metrics is None:
+            metrics = QFontMetricsF(self.cached_font(key))
+            self.metrics[key] = metrics
+        return metrics
+
+    def raw_font(self, family, size, dpr=1.0) -> QRawFont:
+        key = self.key(family, size, dpr)
+        raw_font = self.raw_fonts.get(key)
+        if raw_font is None:
+            raw_font = QRawFont.fromFont(self.cached_font(key))
+            if dpr != 1.0:
+                raw_font.setPixelSize(raw_font.pixelSize() * dpr)
+            self.raw_fonts[key] = raw_font
+        return raw_font
+
+    def prewarm(self, family, size, dpr=1.0, neighbours=2):
+        """Loads the font and the sizes around it in the background, one size per event
+        loop turn, so ctrl+wheel and the settings window hit a warm cache."""
+        sizes = [size] + [s for d in range(1, neighbours + 1) for s in (size + d, size - d) if s > 0]
+        start = not self.warmup_queue
+        self.warmup_queue.extend((family, s, dpr) for s in sizes)
+        if start:
+            QTimer.singleShot(0, self.warm_next)
+
+    def warm_next(self):
+        if not self.warmup_queue:
+            return
+        # after the first frame, the family list costs no startup time here
+        self.report_unknown_families()
+        family, size, dpr = self.warmup_queue.pop(0)
+        self.font_metrics(family, size, dpr)
+        self.raw_font(family, size, dpr)
+
+        # shaping once fills Qt's glyph and shaping caches for the font
+        layout = QTextLayout(WARMUP_SAMPLE, self.cached_font(self.key(family, size, dpr)))
+        layout.beginLayout()
+        layout.createLine()
+        layout.endLayout()
+
+        if self.warmup_queue:
+            QTimer.singleShot(0, self.warm_next)
+
+    def stats(self):
+        return {
+            "font_hits": self.hits,
+            "font_misses": self.misses,
+            "fonts": len(self.fonts),
+            "font_metrics": len(self.metrics),
+            "raw_fonts": len(self.raw_fonts),
+            "resolved_families": len(self.resolved),
+        }
@@ -0,0 +1,219 @@
+"""Publishes overlay frames into a memory-mapped file for local consumers (capture tools,
+compositors) so they do not have to grab a translucent always-on-top window.
+
+File layout, little-endian:
+    header (64 bytes): magic b"TTOF", version u32, sequence u64, width u32, height u32,
+                       stride u32, QImage format u32, front slot u32, slot bytes u32
+    slot 0, slot 1:    ARGB32 premultiplied pixels, `stride` bytes per row
+
+The sequence is a seqlock. Before a frame is written it is made odd, then the back slot is
+painted and the other header fields are rewritten with the new front slot, then it is made
+even again; frame n has sequence 2n. A reader reads the sequence, then the header fields and
+the front slot, then the sequence again. The copy is good if the sequence was even and did
+not change.
+"""
+from __future__ import annotations
+import ctypes
+import mmap
+import os
+import struct
+import sys
+import time
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QImage
+from models import PaintStats
+
+MAGIC = b"TTOF"
+VERSION = 2
+HEADER_FORMAT = "<4sIQIIIIII"
+HEADER_SIZE = 64
+# the sequence on its own, and the fields after it
+SEQUENCE_FORMAT = "<Q"
+SEQUENCE_OFFSET = 8
+FIELDS_FORMAT = "<IIIIII"
+FIELDS_OFFSET = 16
+READ_ATTEMPTS = 3
+FRAME_FORMAT = QImage.Format_ARGB32_Premultiplied
+
+
+class FramePublisher:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w+b")
+        self.mm = None
+        self.mapped_size = 0
+        self.exports = []
+        self.slot_images = []
+
+        self.width = 0
+        self.height = 0
+        self.stride = 0
+        self.slot_bytes = 0
+        self.front = 0
+        self.sequence = 0
+
+        self.last_key = None
+        self.pending = False
+        self.published = 0
+        self.skipped = 0
+        self.publish_stats = PaintStats()
+
+    def schedule(self, overlay):
+        """Publishes on the next event loop turn, once for any number of changes before it."""
+        if self.pending:
+            return
+        self.pending = True
+        QTimer.singleShot(0, lambda: self.publish(overlay))
+
+    def publish(self, overlay):
+        """Paints the overlay into the back slot and flips. Does nothing if its content is unchanged."""
+        self.pending = False
+        key = overlay.frame_key()
+        if key == self.last_key:
+            self.skipped += 1
+            return False
+
+        t0 = time.perf_counter()
+        self.ensure_size(overlay.width(), overlay.height())
+
+        # odd: readers drop what they copy until the header says the frame is complete
+        self.write_sequence(self.sequence + 1)
+        try:
+            back = 1 - self.front
+            image = self.slot_images[back]
+            image.fill(Qt.transparent)
+            overlay.render(image)
+
+            self.front = back
+            self.write_header()
+        finally:
+            self.write_sequence(self.sequence + 1)
+
+        self.last_key = key
+        self.published += 1
+        self.publish_stats.record(time.perf_counter() - t0)
+        return True
+
+    def write_sequence(self, sequence):
+        self.sequence = sequence
+        struct.pack_into(SEQUENCE_FORMAT, self.mm, SEQUENCE_OFFSET, sequence)
+
+    def write_header(self):
+        """Everything but the sequence, which is written on its own around it"""
+        struct.pack_into("<4sI", self.mm, 0, MAGIC, VERSION)
+        struct.pack_into(FIELDS_FORMAT, self.mm, FIELDS_OFFSET,
+                         self.width, self.height, self.stride, int(FRAME_FORMAT), self.front, self.slot_bytes)
+
+    def ensure_size(self, width, height):
+        if (width, height) == (self.width, self.height) and self.slot_images:
+            return
+
+        self.width = max(1, width)
+        self.height = max(1, height)
+        self.stride = self.width * 4
+        self.slot_bytes = self.stride * self.height
+        size = HEADER_SIZE + 2 * self.slot_bytes
+
+        # the slot images point into the mapping, drop them before it may go away
+        self.slot_images = []
+        self.exports = []
+        if size > self.mapped_size:
+            if self.mm is not None:
+                self.mm.close()
+            self.file.truncate(size)
+            self.mm = mmap.mmap(self.file.fileno(), size)
+            self.mapped_size = size
+
+        for slot in range(2):
+            export = ctypes.c_char.from_buffer(self.mm, HEADER_SIZE + slot * self.slot_bytes)
+            self.exports.append(export)
+            address = sip.voidptr(ctypes.addressof(export))
+            self.slot_images.append(QImage(address, self.width, self.height, self.stride, FRAME_FORMAT))
+
+    def close(self):
+        self.slot_images = []
+        self.exports = []
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.file.close()
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "skipped": self.skipped,
+            "publish_avg_ms": round(self.publish_stats.avg_ms, 3),
+            "publish_max_ms": round(self.publish_stats.max_ms, 3),
+            "sequence": self.sequence,
+        }
+
+
+def read_frame(path):
+    """Reads the current frame: (frame number, width, height, stride, pixels), or None if there
+    is none yet or it kept being overwritten while copying."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER_SIZE:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if mm[:4] != MAGIC:
+                return None
+            for _ in range(READ_ATTEMPTS):
+                sequence = struct.unpack_from(SEQUENCE_FORMAT, mm, SEQUENCE_OFFSET)[0]
+                if sequence == 0:
+                    return None
+                if sequence % 2:
+                    # a frame is being written
+                    time.sleep(0.001)
+                    continue
+                width, height, stride, _, front, slot_bytes = struct.unpack_from(FIELDS_FORMAT, mm, FIELDS_OFFSET)
+                start = HEADER_SIZE + front * slot_bytes
+                if start + stride * height > len(mm):
+                    # the file grew for a larger frame after it was mapped
+                    return None
+                pixels = mm[start:start + stride * height]
+                if struct.unpack_from(SEQUENCE_FORMAT, mm, SEQUENCE_OFFSET)[0] == sequence:
+                    return sequence // 2, width, height, stride, pixels
+            return None
+        finally:
+            mm.close()
+
+
+def benchmark(frames=200):
+    """Cost of publish() for unchanged and changed content, offscreen."""
+    import tempfile
+    from PyQt5.QtWidgets import QApplication
+    from config import initDisplaySettings
+    from overlay.overlay_widget import OverlayWidget
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    path = os.path.join(tempfile.gettempdir(), "ttof_benchmark.frames")
+    for widget_type in (0, 1):
+        overlay = OverlayWidget({}, initDisplaySettings({"text_overlay_type": widget_type, "w": 400, "h": 300}))
+        overlay.setText("Benchmark line\n" * 10)
+        overlay.text_edit.finish_layout()
+        publisher = FramePublisher(path)
+        publisher.publish(overlay)
+
+        t0 = time.perf_counter()
+        for _ in range(frames):
+            publisher.publish(overlay)
+        unchanged_us = (time.perf_counter() - t0) / frames * 1e6
+
+        t0 = time.perf_counter()
+        for i in range(frames):
+            overlay.setText(f"Benchmark frame {i}\n" * 10)
+            overlay.text_edit.finish_layout()
+            publisher.publish(overlay)
+        changed_ms = (time.perf_counter() - t0) / frames * 1000
+
+        print(f"{type(overlay.text_edit).__name__}: unchanged {unchanged_us:.2f} us/frame (nothing copied), "
+              f"changed {changed_ms:.3f} ms/frame incl. setText, publish alone avg {publisher.publish_stats.avg_ms:.3f} ms "
+              f"({overlay.width()}x{overlay.height()})")
+        publisher.close()
+        overlay.close()
+    os.remove(path)
+
+if __name__ == "__main__":
+    benchmark()
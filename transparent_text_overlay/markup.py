@@ -0,0 +1,173 @@
+"""Styled spans from ANSI SGR escape codes and lightweight [tag] markup.
+
+Supported tags: [b] [i] [u] [color=<qt color>] [outline=<qt color>], each closed with
+[/b] etc. Anything else in brackets is left as text. Styling does not carry over from one
+paragraph to the next, so every paragraph can be parsed, and cached, on its own.
+"""
+from __future__ import annotations
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Optional, Tuple
+
+ANSI_PATTERN = r"\x1b\[([0-9;?]*)([A-Za-z])"
+TAG_PATTERN = r"\[(/?)(b|i|u|color|outline)(?:=([#\w]+))?\]"
+
+ANSI_ONLY = re.compile(ANSI_PATTERN)
+ANSI_AND_TAGS = re.compile(ANSI_PATTERN + "|" + TAG_PATTERN)
+
+# xterm default palette, normal then bright
+ANSI_COLORS = [
+    "#000000", "#cd0000", "#00cd00", "#cdcd00", "#0000ee", "#cd00cd", "#00cdcd", "#e5e5e5",
+    "#7f7f7f", "#ff0000", "#00ff00", "#ffff00", "#5c5cff", "#ff00ff", "#00ffff", "#ffffff",
+]
+
+
+@dataclass(frozen=True)
+class SpanStyle:
+    fg: Optional[str] = None
+    outline: Optional[str] = None
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+
+    @property
+    def plain(self):
+        return self == PLAIN
+
+
+PLAIN = SpanStyle()
+
+
+@dataclass(frozen=True)
+class StyledParagraph:
+    text: str
+    # (start, length, style) over `text`, sorted, non-overlapping, plain runs left out
+    spans: Tuple[Tuple[int, int, SpanStyle], ...] = ()
+
+    def segments(self, start, end):
+        """(start, end, style or None) runs covering [start, end)."""
+        pos = start
+        for span_start, length, style in self.spans:
+            span_end = span_start + length
+            if span_end <= pos:
+                continue
+            if span_start >= end:
+                break
+            if span_start > pos:
+                yield pos, span_start, None
+            yield max(pos, span_start), min(span_end, end), style
+            pos = min(span_end, end)
+        if pos < end:
+            yield pos, end, None
+
+
+def xterm_256(n):
+    if n < 16:
+        return ANSI_COLORS[n]
+    if n < 232:
+        n -= 16
+        levels = [0, 95, 135, 175, 215, 255]
+        return "#{:02x}{:02x}{:02x}".format(levels[n // 36], levels[n // 6 % 6], levels[n % 6])
+    gray = 8 + (n - 232) * 10
+    return "#{:02x}{:02x}{:02x}".format(gray, gray, gray)
+
+
+def apply_sgr(style: SpanStyle, params: str):
+    codes = [int(code) if code.isdigit() else 0 for code in params.split(";")] if params else [0]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 0:
+            style = PLAIN
+        elif code == 1:
+            style = replace(style, bold=True)
+        elif code == 3:
+            style = replace(style, italic=True)
+        elif code == 4:
+            style = replace(style, underline=True)
+        elif code == 22:
+            style = replace(style, bold=False)
+        elif code == 23:
+            style = replace(style, italic=False)
+        elif code == 24:
+            style = replace(style, underline=False)
+        elif 30 <= code <= 37 or 90 <= code <= 97:
+            style = replace(style, fg=ANSI_COLORS[code - 30 if code < 90 else code - 82])
+        elif code == 39:
+            style = replace(style, fg=None)
+        elif 40 <= code <= 47 or 100 <= code <= 107:
+            # a background has no meaning on a transparent overlay, it colors the outline
+            style = replace(style, outline=ANSI_COLORS[code - 40 if code < 100 else code - 92])
+        elif code == 49:
+            style = replace(style, outline=None)
+        elif code in (38, 48) and i + 1 < len(codes):
+            color = None
+            if codes[i + 1] == 5 and i + 2 < len(codes):
+                color = xterm_256(codes[i + 2] % 256)
+                i += 2
+            elif codes[i + 1] == 2 and i + 4 < len(codes):
+                color = "#{:02x}{:02x}{:02x}".format(*(min(255, c) for c in codes[i + 2:i + 5]))
+                i += 4
+            style = replace(style, fg=color) if code == 38 else replace(style, outline=color)
+        i += 1
+    return style
+
+
+def needs_parsing(text, markup):
+    return "\x1b" in text or (markup and "[" in text)
+
+
+@lru_cache(maxsize=8192)
+def parse_paragraph(paragraph: str, markup: bool = False) -> StyledParagraph:
+    if not needs_parsing(paragraph, markup):
+        return StyledParagraph(paragraph)
+
+    pattern = ANSI_AND_TAGS if markup else ANSI_ONLY
+    text = []
+    spans = []
+    length = 0
+    style = PLAIN
+    stacks = {"color": [], "outline": []}
+
+    def add(chunk):
+        nonlocal length
+        if not chunk:
+            return
+        text.append(chunk)
+        if not style.plain:
+            if spans and spans[-1][2] == style and spans[-1][0] + spans[-1][1] == length:
+                start, span_length, _ = spans[-1]
+                spans[-1] = (start, span_length + len(chunk), style)
+            else:
+                spans.append((length, len(chunk), style))
+        length += len(chunk)
+
+    last = 0
+    for match in pattern.finditer(paragraph):
+        add(paragraph[last:match.start()])
+        last = match.end()
+
+        if match.group(2) is not None:
+            # ANSI: only SGR changes the style, other CSI sequences are dropped
+            if match.group(2) == "m":
+                style = apply_sgr(style, match.group(1))
+            continue
+
+        closing, tag, value = match.group(3), match.group(4), match.group(5)
+        if tag in ("b", "i", "u"):
+            attribute = {"b": "bold", "i": "italic", "u": "underline"}[tag]
+            style = replace(style, **{attribute: not closing})
+        elif closing and stacks[tag]:
+            style = replace(style, **{"fg" if tag == "color" else "outline": stacks[tag].pop()})
+        elif value:
+            attribute = "fg" if tag == "color" else "outline"
+            stacks[tag].append(getattr(style, attribute))
+            style = replace(style, **{attribute: value})
+        else:
+            # [color] without a value, or [/color] without an opener, is not markup
+            add(match.group(0))
+    add(paragraph[last:])
+
+    return StyledParagraph("".join(text), tuple(spans))
+
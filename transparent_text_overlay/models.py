@@ -18,6 +18,28 @@ class DisplaySettings:
     h: int = None
     outlineSize: int = None
     textFilePath: str = None
+    templateFields: bool = True
+    wordWrap: bool = False
+    markup: bool = False
+
+
+@dataclass
+class PaintStats:
+    count: int = 0
+    total_ms: float = 0.0
+    last_ms: float = 0.0
+    max_ms: float = 0.0
+    
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        self.count += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
     
     
 class ConfigProps(Enum):
@@ -36,4 +58,13 @@ class ConfigProps(Enum):
     TEXT_OVERLAY_TYPE = "text_overlay_type"
     DRAGGABLE = "draggable"
     OUTLINE_SIZE = "outline_size"
-    WATCH_FILE_SAVEBACK = "watch_file_saveback"
\ No newline at end of file
+    WATCH_FILE_SAVEBACK = "watch_file_saveback"
+    OVERLAYS = "overlays"
+    LAZY_STARTUP = "lazy_startup"
+    SHOW_SETTINGS_ON_START = "show_settings_on_start"
+    TEMPLATE_FIELDS = "template_fields"
+    FRAME_OUTPUT = "frame_output"
+    WORD_WRAP = "word_wrap"
+    MARKUP = "markup"
+    MAX_FPS = "max_fps"
+    RECORD_UPDATES = "record_updates"
\ No newline at end of file
@@ -0,0 +1,266 @@
+from __future__ import annotations
+import sys
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSizeGrip, QShortcut
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QKeySequence
+from models import ConfigProps, DisplaySettings
+from render_cache import SharedCaches
+from template import TemplateEngine
+from update_scheduler import UpdateScheduler
+from text_model import TextModel
+
+SETTINGS_SHORTCUT = "Ctrl+Shift+S"
+
+
+def create_text_widget(widget_type, parent, text, displaySettings: DisplaySettings, caches: SharedCaches):
+    """Imports the renderer only when it is selected."""
+    if widget_type == 1:
+        from overlay.sol_text_overlay import OutlinedTextWidget
+        return OutlinedTextWidget(parent, text, displaySettings, caches)
+
+    from overlay.text_overlay import DraggableTextEdit
+    return DraggableTextEdit(parent, text, displaySettings, caches)
+
+
+class OverlayWidget(QWidget):
+    def __init__(self, config, displaySettings: DisplaySettings, caches: SharedCaches = None, updates: UpdateScheduler = None, model: TextModel = None):
+        super().__init__()
+        self.displaySettings = displaySettings
+        self.caches = caches if caches is not None else SharedCaches()
+        self.updates = updates
+        self.settings = None
+        self.edit_mode = config.get(ConfigProps.DRAGGABLE.value, True)
+        self.model = model if model is not None else TextModel("No text")
+        self.model.changed.connect(self.on_model_changed)
+        self.template = TemplateEngine(self.on_template_paragraphs_changed)
+        self.content_version = 0
+        self.frame_listener = None
+        self.recorder = None
+        self.recorder_id = None
+
+        self.text_widget_type = self.displaySettings.widgetType
+        self.text_font = self.displaySettings.font
+
+        print('twt', self.text_widget_type)
+        self.text_edit = create_text_widget(self.text_widget_type, self, "", self.displaySettings, self.caches)
+        self.text_edit.set_paragraphs(self.display_paragraphs())
+        # line height and the other block formats apply to the text already set
+        self.text_edit.updateFont()
+
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setWindowFlags(self.windowFlags() | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+
+        self.size_grip = QSizeGrip(self)
+
+        self.mylayout = QVBoxLayout()
+        self.mylayout.setContentsMargins(10, 10, 10, 10)
+        self.mylayout.addWidget(self.text_edit)
+        self.mylayout.addWidget(self.size_grip, 0, Qt.AlignBottom | Qt.AlignRight)
+        self.setLayout(self.mylayout)
+
+        if self.edit_mode:
+            self.setWindowFlag(Qt.WindowTransparentForInput, False)
+            self.setStyleSheet("background-color: rgba(40, 40, 40, 200); border: 2px solid red;")
+            self.text_edit.setStyleSheet("background-color: rgba(0, 0, 0, 50); border: 2px dashed red")
+            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        else:
+            self.setWindowFlag(Qt.WindowTransparentForInput, True)
+            self.setStyleSheet("background-color: transparent;")
+            self.text_edit.setStyleSheet("background-color: transparent; border: none;")
+            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+        self.text_edit.setEnabled(self.edit_mode)
+
+        if self.displaySettings.w is not None and self.displaySettings.h is not None:
+            self.resize(displaySettings.w, displaySettings.h)
+        if self.displaySettings.x is not None and self.displaySettings.y is not None:
+            self.move(displaySettings.x, displaySettings.y)
+
+        self.position_changed_callback = None
+        self.settings_requested_callback = None
+        self.first_paint_callback = None
+
+        self.settings_shortcut = QShortcut(QKeySequence(SETTINGS_SHORTCUT), self)
+        self.settings_shortcut.activated.connect(self.request_settings)
+        self.show()
+
+    def register_settings(self, sett: SettingsWindow):
+        self.settings = sett
+
+    def set_display_settingsR(self, sett: DisplaySettings):
+        self.displaySettings = sett
+        self.text_edit.set_display_settings(sett)
+
+    def change_widget_type(self, new_val):
+        if new_val == self.text_widget_type:
+            return
+        print(f'changing from {self.text_widget_type} to {new_val}')
+        self.text_widget_type = new_val
+
+        self.mylayout.removeWidget(self.text_edit)
+        self.text_edit.deleteLater()
+
+        new_widget = create_text_widget(self.text_widget_type, self, "", self.displaySettings, self.caches)
+        self.mylayout.insertWidget(0, new_widget)
+        self.text_edit = new_widget
+
+        self.refresh_text()
+
+    def donwstream_fontsize_update(self, fontsize):
+        self.content_changed()
+        if self.settings is not None:
+            self.settings.donwstream_fontsize_update(fontsize, self)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        new_size = self.size()
+
+        self.displaySettings.w = new_size.width()
+        self.displaySettings.h = new_size.height()
+        self.content_changed()
+
+
+    def set_position_changed_callback(self, callback):
+        self.position_changed_callback = callback
+
+    def set_settings_requested_callback(self, callback):
+        self.settings_requested_callback = callback
+
+    def request_settings(self):
+        if self.settings_requested_callback:
+            self.settings_requested_callback()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_callback:
+            callback = self.first_paint_callback
+            self.first_paint_callback = None
+            callback(self)
+
+    def enter_edit_mode(self, enabled: bool):
+        # scroll_pos = self.text_edit.verticalScrollBar().value()
+        self.edit_mode = enabled
+        geometry = self.geometry()
+        self.hide()
+
+        if enabled:
+            self.setWindowFlag(Qt.WindowTransparentForInput, False)
+        else:
+            self.setWindowFlag(Qt.WindowTransparentForInput, True)
+        self.setGeometry(geometry)
+        self.show()
+        print('edit mode', enabled)
+
+        self.text_edit.setEnabled(enabled)
+
+        if enabled:
+            self.setStyleSheet("background-color: rgba(40, 40, 40, 200); border: 2px solid red;")
+            self.text_edit.setStyleSheet("background-color: rgba(0, 0, 0, 50); border: 2px dashed red")
+            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        else:
+            self.setStyleSheet("background-color: transparent;")
+            self.text_edit.setStyleSheet("background-color: transparent; border: none; margin: 2px")
+            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+        self.adjustSize()
+
+        self.setGeometry(geometry)
+        self.content_changed()
+
+    def updateFontR(self):
+        self.text_edit.updateFont()
+        self.content_changed()
+
+    @property
+    def text(self):
+        return self.model.text()
+
+    def setText(self, content, source="api"):
+        """Updates the text model; the renderer follows with the changed lines only."""
+        if self.recorder is not None:
+            self.recorder.record(self.recorder_id, self.text, content, source)
+        self.model.set_text(content)
+
+    def refresh_text(self):
+        """Hands the whole text to the renderer again, after a change in how it is parsed."""
+        self.text_edit.set_paragraphs(self.display_paragraphs())
+        self.text_edit.updateFont()
+        self.content_changed()
+
+    def on_model_changed(self, start, removed, inserted):
+        lines = self.model.lines[start:start + inserted]
+        if self.displaySettings.templateFields:
+            lines = self.template.replace_paragraphs(start, removed, lines)
+        if not self.text_edit.replace_paragraphs(start, removed, lines):
+            # the renderer lost track of the lines, it gets the whole text instead
+            self.refresh_text()
+            return
+        self.content_changed()
+
+    def queue_text(self, content, source="api"):
+        """setText on the next frame of the update scheduler; a later call replaces it."""
+        self.schedule_update(lambda: self.setText(content, source), source)
+
+    def schedule_update(self, callback, source="api"):
+        if self.updates is None:
+            callback()
+            return
+        self.updates.schedule(self, callback, source)
+
+    def set_recorder(self, recorder, recorder_id=0):
+        """Every setText is passed to recorder.record(recorder_id, old, new, source)."""
+        self.recorder = recorder
+        self.recorder_id = recorder_id
+
+    def set_frame_listener(self, listener):
+        self.frame_listener = listener
+        self.content_changed()
+
+    def content_changed(self):
+        self.content_version += 1
+        if self.frame_listener:
+            self.frame_listener(self)
+
+    def frame_key(self):
+        """Changes whenever what the overlay shows may have changed."""
+        ds = self.displaySettings
+        return (
+            self.content_version, self.text_widget_type, self.edit_mode, self.width(), self.height(),
+            ds.font.key(), ds.color1.rgba(), ds.color2.rgba(), ds.outlineSize, ds.lineSpace, ds.wordWrap, ds.markup,
+            self.text_edit.verticalScrollBar().value(), self.text_edit.horizontalScrollBar().value(),
+        )
+
+    def display_paragraphs(self):
+        """The lines as shown, with template fields resolved. They share the model's strings
+        wherever there is nothing to resolve."""
+        if not self.displaySettings.templateFields:
+            self.template.set_paragraphs([])
+            return list(self.model.lines)
+        return self.template.set_paragraphs(self.model.lines)
+
+
+    def on_template_paragraphs_changed(self, changes):
+        for index, paragraph in changes.items():
+            if not self.text_edit.replace_paragraphs(index, 1, [paragraph]):
+                self.refresh_text()
+                return
+        self.content_changed()
+
+    def stats(self):
+        """Paint cost of the current renderer and what this overlay holds in memory."""
+        paint_stats = self.text_edit.paint_stats
+        stats = {
+            "renderer": type(self.text_edit).__name__,
+            "paints": paint_stats.count,
+            "paint_avg_ms": round(paint_stats.avg_ms, 3),
+            "paint_last_ms": round(paint_stats.last_ms, 3),
+            "paint_max_ms": round(paint_stats.max_ms, 3),
+            "text_bytes": sum(map(sys.getsizeof, self.model.lines)),
+            "text_version": self.model.version,
+        }
+        stats.update(self.text_edit.memory_stats())
+        return stats
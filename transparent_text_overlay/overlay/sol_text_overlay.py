@@ -1,23 +1,75 @@
+import math
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from operator import attrgetter
 from PyQt5.QtWidgets import QApplication, QAbstractScrollArea, QScrollBar
-from PyQt5.QtGui import QPainter, QColor, QFont, QTextLayout, QTextOption, QPainterPath, QPen
-from PyQt5.QtCore import Qt, QPointF, QPoint
+from PyQt5.QtGui import QPainter, QColor, QFont, QTextLayout, QTextOption, QPen, QFontMetricsF
+from PyQt5.QtCore import Qt, QPointF, QPoint, QRect, QTimer, QTextBoundaryFinder
 from PyQt5.QtGui import QTextCharFormat
 
-from models import DisplaySettings
+from models import DisplaySettings, PaintStats
+from render_cache import SharedCaches, PATH_ELEMENT_BYTES
+from markup import parse_paragraph, SpanStyle
+
+# wrap widths whose complete layouts are kept, for drag-resizing back and forth
+WRAP_CACHE_SIZE = 4
+# layout time per event loop turn; what does not fit is continued on the next turn
+LAYOUT_SLICE_MS = 8
+# restacking is O(paragraphs), off-screen progress updates the scrollbar this often
+LAYOUT_REFRESH_MS = 100
+# replacing more paragraphs than this at once goes through progressive layout
+REPLACE_SYNC_LIMIT = 64
+
+
+class ParagraphLayout:
+    """One laid out paragraph. Its line breaks stay the same for any wrap width in
+    [min_wrap, max_wrap), so resizing within that range needs no new layout.
+    A paragraph not laid out yet has no layout and an estimated height."""
+    __slots__ = ("styled", "layout", "height", "width", "min_wrap", "max_wrap")
+
+    def __init__(self, styled, layout, height, width, min_wrap, max_wrap):
+        self.styled = styled
+        self.layout = layout
+        self.height = height
+        self.width = width
+        self.min_wrap = min_wrap
+        self.max_wrap = max_wrap
+
 
 class OutlinedTextWidget(QAbstractScrollArea):
-    def __init__(self, parent=None, text="No text", displaySettings: DisplaySettings = None):
+    def __init__(self, parent=None, text="No text", displaySettings: DisplaySettings = None, caches: SharedCaches = None):
         super().__init__()
         
         self.overlay_widget = parent
         self.displaySettings = displaySettings
+        self.caches = caches if caches is not None else SharedCaches()
+        self.paint_stats = PaintStats()
+        self.painted_paths = {}
         
-        self.ttext = text
+        self.paragraphs = text.split("\n")
 
         self.last_pos = QPoint()
         self.viewport().setCursor(Qt.SizeAllCursor)
 
+        # one ParagraphLayout per paragraph, laid out from y=0 and placed by update_offsets
         self.layout_lines = []
+        self.paragraph_y = []
+        self.layout_width = None
+        self.wrap_cache = OrderedDict()
+        self.span_styles = {}
+        self.placeholders = {}
+        self.built_key = None
+
+        # progressive layout: paragraphs after layout_forward, then before layout_backward
+        self.layout_timer = QTimer(self)
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.timeout.connect(self.layout_slice)
+        self.layout_forward = 0
+        self.layout_backward = -1
+        self.layout_shift = 0
+        self.layout_refreshed = 0.0
         self.rebuild_layout()
 
         self.update_scrollbar()
@@ -26,62 +78,336 @@ class OutlinedTextWidget(QAbstractScrollArea):
         self.displaySettings = sett
         
     def setTYext(self, text):
-        self.ttext = text
+        self.set_paragraphs(text.split("\n"))
+
+    def set_paragraphs(self, paragraphs):
+        self.paragraphs = list(paragraphs)
         self.rebuild_layout()
 
     def updateFont(self):
-        self.rebuild_layout()
+        if self.layout_key() != self.built_key:
+            self.rebuild_layout()
+        else:
+            self.span_styles.clear()
         self.update_scrollbar()
         self.viewport().update()
         
-    def rebuild_layout(self):
-        """Prepares layout lines with QTextLayout"""
+    def wrap_width(self):
+        if not self.displaySettings.wordWrap:
+            return float("inf")
+        return float(max(1, self.viewport().width() - 2 * self.displaySettings.outlineSize))
+        
+    def layout_paragraph(self, paragraph, wrap_width):
+        """Lays out one paragraph with QTextLayout, lines positioned from y=0"""
         option = QTextOption()
         option.setWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
 
-        self.layout_lines.clear()
+        styled = parse_paragraph(paragraph, self.displaySettings.markup)
+        paragraph = styled.text
+        layout = QTextLayout(paragraph)
+        layout.setTextOption(option)
 
-        max_line_width = 0
+        format = QTextCharFormat()
+        format.setFont(self.displaySettings.font)
 
+        format_range = QTextLayout.FormatRange()
+        format_range.start = 0
+        format_range.length = len(paragraph)
+        format_range.format = format
+        
+        format_ranges = [format_range]
+        for start, length, style in styled.spans:
+            span_range = QTextLayout.FormatRange()
+            span_range.start = start
+            span_range.length = length
+            span_range.format = QTextCharFormat(format)
+            span_range.format.setFont(self.span_paint(style)[0])
+            format_ranges.append(span_range)
+
+        layout.setAdditionalFormats(format_ranges)
+        
+        max_line_width = 0
         y = 0
+        lines = []
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(wrap_width) 
+            max_line_width = max(max_line_width, line.naturalTextWidth())
+            line.setPosition(QPointF(0, y))
+            lines.append(line)
         
-        for paragraph in self.ttext.splitlines():
-            
-            layout = QTextLayout(paragraph)
-            layout.setTextOption(option)
-
-            format = QTextCharFormat()
-            format.setFont(self.displaySettings.font)
-
-            format_range = QTextLayout.FormatRange()
-            format_range.start = 0
-            format_range.length = len(paragraph)
-            format_range.format = format
-
-            layout.setAdditionalFormats([format_range])
-            layout.beginLayout()
-            while True:
-                line = layout.createLine()
-                if not line.isValid():
-                    break
-                line.setLineWidth(float("inf")) 
-                max_line_width = max(max_line_width, line.naturalTextWidth())
-                line.setPosition(QPointF(0, y))
+            y += line.height() + self.displaySettings.lineSpace
+        layout.endLayout()
+        
+        # Qt keeps a line if its text without the trailing spaces fits, including how far the
+        # last glyph reaches past its advance; the next line rejoins once the line with its
+        # spaces and the next word fit. cursorToX stops at the wrap width, so the trailing
+        # spaces are measured with the font
+        min_wrap = 0.0
+        max_wrap = float("inf")
+        breaks = QTextBoundaryFinder(QTextBoundaryFinder.Line, paragraph) if len(lines) > 1 else None
+        for line, next_line in zip(lines, lines[1:] + [None]):
+            start = line.textStart()
+            end = start + line.textLength()
+            core_end = start + len(paragraph[start:end].rstrip())
+            width = line.cursorToX(core_end)[0] - line.cursorToX(start)[0]
+            if core_end > start:
+                min_wrap = max(min_wrap, width + self.overhang(styled, core_end - 1))
+            if next_line is None:
+                break
+            # Qt breaks after spaces and at line break opportunities
+            breaks.setPosition(end)
+            if not (breaks.isAtBoundary() or paragraph[end - 1].isspace()):
+                # broken inside a word: those breaks do not follow from the widths, the
+                # layout is only kept for the width it was made for
+                min_wrap, max_wrap = wrap_width, wrap_width
+                break
+            word = paragraph[end:min(breaks.toNextBoundary(), end + next_line.textLength())]
+            word_end = end + len(word.split(None, 1)[0] if word.strip() else "")
+            width += self.font_metrics_at(styled, core_end).horizontalAdvance(paragraph[core_end:end])
+            if word_end > end:
+                width += next_line.cursorToX(word_end)[0] - next_line.cursorToX(end)[0] + self.overhang(styled, word_end - 1)
+            max_wrap = min(max_wrap, width)
             
-                y += line.height() + self.displaySettings.lineSpace
-            layout.endLayout()
-            self.layout_lines.append((layout, y)) 
+        return ParagraphLayout(styled, layout, y, max_line_width, min_wrap, max_wrap)
+        
+    def overhang(self, styled, index):
+        """How far the glyph at index reaches past its advance, which Qt adds to fit a line"""
+        return max(0.0, -self.font_metrics_at(styled, index).rightBearing(styled.text[index]))
+
+    def font_metrics_at(self, styled, index):
+        style = None
+        for start, length, span_style in styled.spans:
+            if start <= index < start + length:
+                style = span_style
+        metrics = self.glyph_metrics.get(style)
+        if metrics is None:
+            metrics = QFontMetricsF(self.span_paint(style)[0])
+            self.glyph_metrics[style] = metrics
+        return metrics
+
+    def span_paint(self, style: SpanStyle):
+        """(font, fill, outline) for a styled span"""
+        key = (self.displaySettings.font.key(), style)
+        paint = self.span_styles.get(key)
+        if paint is None:
+            font = QFont(self.displaySettings.font)
+            font.setBold(style.bold or font.bold())
+            font.setItalic(style.italic)
+            font.setUnderline(style.underline)
+            fill = QColor(style.fg) if style.fg else self.displaySettings.color1
+            outline = QColor(style.outline) if style.outline else self.displaySettings.color2
+            paint = (font, fill, outline)
+            self.span_styles[key] = paint
+        return paint
+        
+    def placeholder(self, paragraph):
+        """Estimated stand-in for a paragraph waiting for layout, shared by equal lengths"""
+        entry = self.placeholders.get(len(paragraph))
+        if entry is None:
+            lines = 1
+            if self.layout_width != float("inf") and paragraph:
+                lines = max(1, math.ceil(len(paragraph) * self.average_char_width / self.layout_width))
+            entry = ParagraphLayout(None, None, lines * self.estimated_line_height, 0, float("inf"), float("-inf"))
+            self.placeholders[len(paragraph)] = entry
+        return entry
+
+    def layout_key(self):
+        """Settings the layout depends on; colors only need a repaint"""
+        ds = self.displaySettings
+        return (ds.font.key(), ds.lineSpace, ds.outlineSize, ds.markup, self.wrap_width())
+
+    def rebuild_layout(self):
+        """Prepares layout lines with QTextLayout, in time slices for long texts"""
+        self.wrap_cache.clear()
+        self.span_styles.clear()
+        self.layout_width = self.wrap_width()
+
+        metrics = QFontMetricsF(self.displaySettings.font)
+        self.estimated_line_height = metrics.height() + self.displaySettings.lineSpace
+        self.average_char_width = metrics.averageCharWidth()
+        # per span style, None for the plain font
+        self.glyph_metrics = {None: metrics}
+        self.placeholders = {}
+
+        if self.layout_width == float("inf"):
+            self.layout_lines = [self.placeholder("")] * len(self.paragraphs)
+        else:
+            self.layout_lines = [self.placeholder(paragraph) for paragraph in self.paragraphs]
+        self.built_key = self.layout_key()
+        self.start_layout()
+
+    def start_layout(self):
+        """Lays out the waiting paragraphs, those around the scroll position first. Work
+        left over from previous text is dropped."""
+        self.update_offsets()
+        first = max(0, bisect_right(self.paragraph_y, self.verticalScrollBar().value()) - 1)
+        self.layout_forward = first
+        self.layout_backward = first - 1
+        self.layout_shift = 0
+        self.layout_slice(initial=True)
+
+    def next_pending(self, visible):
+        """Index of the next paragraph to lay out: visible ones, then down from the
+        scroll position, then up from it, then anything left after edits."""
+        while visible:
+            index = visible.pop()
+            if self.layout_lines[index].layout is None:
+                return index
+        while self.layout_forward < len(self.layout_lines):
+            self.layout_forward += 1
+            if self.layout_lines[self.layout_forward - 1].layout is None:
+                return self.layout_forward - 1
+        while self.layout_backward >= 0:
+            self.layout_backward -= 1
+            if self.layout_lines[self.layout_backward + 1].layout is None:
+                return self.layout_backward + 1
+        return next((i for i, entry in enumerate(self.layout_lines) if entry.layout is None), None)
+
+    def layout_slice(self, initial=False):
+        """Lays out paragraphs until the slice budget is spent, then yields to the event loop"""
+        self.layout_timer.stop()
+        deadline = time.perf_counter() + LAYOUT_SLICE_MS / 1000
+
+        # keep what is on screen in place while paragraphs above it get their real height
+        scroll = self.verticalScrollBar().value()
+        anchor = max(0, bisect_right(self.paragraph_y, scroll) - 1)
+        bottom = scroll + self.viewport().height()
+        visible_range = range(anchor, bisect_right(self.paragraph_y, bottom))
+        visible = list(reversed(visible_range))
+        repaint = False
+
+        while True:
+            index = self.next_pending(visible)
+            if index is None:
+                break
+            old_height = self.layout_lines[index].height
+            self.layout_lines[index] = self.layout_paragraph(self.paragraphs[index], self.layout_width)
+            if index < anchor:
+                self.layout_shift += self.layout_lines[index].height - old_height
+            repaint = repaint or index in visible_range
+            if time.perf_counter() >= deadline:
+                self.layout_timer.start(0)
+                break
+
+        now = time.perf_counter()
+        done = not self.layout_timer.isActive()
+        if not (initial or repaint or done or now - self.layout_refreshed >= LAYOUT_REFRESH_MS / 1000):
+            return
+        self.layout_refreshed = now
+        self.update_offsets()
+        if initial:
+            return
+        self.update_scrollbar()
+        if self.layout_shift:
+            self.verticalScrollBar().setValue(int(scroll + self.layout_shift))
+            self.layout_shift = 0
+        # paragraphs off screen only move the scrollbar
+        if repaint:
+            self.viewport().update()
+            if self.overlay_widget is not None:
+                self.overlay_widget.content_changed()
+
+    def is_layout_pending(self):
+        return self.layout_timer.isActive()
+
+    def finish_layout(self):
+        """Lays out every waiting paragraph now, for rendering without an event loop"""
+        self.layout_timer.stop()
+        for index, entry in enumerate(self.layout_lines):
+            if entry.layout is None:
+                self.layout_lines[index] = self.layout_paragraph(self.paragraphs[index], self.layout_width)
+        self.layout_shift = 0
+        self.update_offsets()
+        self.update_scrollbar()
+        self.viewport().update()
+        
+    def relayout_for_width(self):
+        """New wrap width: reuse cached layouts for it, else re-break only the paragraphs
+        whose line breaks change at that width"""
+        wrap_width = self.wrap_width()
+        if wrap_width == self.layout_width:
+            return
+        
+        self.wrap_cache[self.layout_width] = self.layout_lines
+        self.wrap_cache.move_to_end(self.layout_width)
+        
+        cached = self.wrap_cache.pop(wrap_width, None)
+        self.layout_width = wrap_width
+        self.placeholders = {}
+        if cached is not None:
+            self.layout_lines = cached
+        else:
+            self.layout_lines = [
+                entry if entry.min_wrap <= wrap_width < entry.max_wrap else self.placeholder(paragraph)
+                for entry, paragraph in zip(self.layout_lines, self.paragraphs)
+            ]
+        
+        while len(self.wrap_cache) > WRAP_CACHE_SIZE:
+            self.wrap_cache.popitem(last=False)
+        self.start_layout()
+        
+    def update_offsets(self):
+        """Stacks the paragraph layouts, no shaping involved"""
+        self.paragraph_y = [0]
+        self.paragraph_y.extend(accumulate(map(attrgetter("height"), self.layout_lines)))
+        self.full_height = self.paragraph_y.pop()
 
-        self.full_height = y
+        max_line_width = max(map(attrgetter("width"), self.layout_lines), default=0)
         self.full_width = int(max_line_width)
         self.horizontalScrollBar().setRange(0, int(max(0, max_line_width - self.viewport().width())))
         self.horizontalScrollBar().setPageStep(self.viewport().width())
+        
+    def replace_paragraphs(self, start, count, new_paragraphs):
+        """Replaces paragraphs [start, start+count) and lays out only the new ones.
+        Always True, any paragraph index is valid here."""
+        if len(new_paragraphs) > REPLACE_SYNC_LIMIT:
+            self.paragraphs[start:start + count] = new_paragraphs
+            self.layout_lines[start:start + count] = [self.placeholder(paragraph) for paragraph in new_paragraphs]
+            self.wrap_cache.clear()
+            self.start_layout()
+            self.update_scrollbar()
+            self.viewport().update()
+            return True
+        
+        old_heights = [entry.height for entry in self.layout_lines[start:start + count]]
+        new_entries = [self.layout_paragraph(paragraph, self.layout_width) for paragraph in new_paragraphs]
+        
+        self.paragraphs[start:start + count] = new_paragraphs
+        self.layout_lines[start:start + count] = new_entries
+        self.wrap_cache.clear()
+        
+        if old_heights != [entry.height for entry in new_entries]:
+            self.update_offsets()
+            self.update_scrollbar()
+            self.viewport().update()
+            return True
+        
+        # same heights: nothing moves, repaint just the replaced paragraphs
+        self.update_offsets()
+        for index in range(start, start + len(new_entries)):
+            self.viewport().update(self.paragraph_rect(index))
+        return True
+            
+    def paragraph_rect(self, index):
+        margin = self.displaySettings.outlineSize + abs(self.displaySettings.lineSpace) + 2
+        top = self.paragraph_y[index] - self.verticalScrollBar().value() - margin
+        height = self.layout_lines[index].height + 2 * margin
+        return QRect(0, int(top), self.viewport().width(), int(height) + 1)
 
     def update_scrollbar(self):
         scroll_range = max(0, int(self.full_height - self.viewport().height()))
         self.verticalScrollBar().setRange(0, scroll_range)
         self.verticalScrollBar().setPageStep(self.viewport().height())
 
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        if self.overlay_widget is not None:
+            self.overlay_widget.content_changed()
+
     def wheelEvent(self, event):
         modifiers = QApplication.keyboardModifiers()
         if modifiers == Qt.ControlModifier:
@@ -93,7 +419,7 @@ class OutlinedTextWidget(QAbstractScrollArea):
             else:
                 fs = max(1, fs - 1)
 
-            self.displaySettings.font.setPointSize(fs)
+            self.displaySettings.font = self.caches.fonts.get(self.displaySettings.font.family(), fs, self.devicePixelRatioF())
 
             if self.overlay_widget is not None:
                 self.overlay_widget.donwstream_fontsize_update(fs)
@@ -106,24 +432,48 @@ class OutlinedTextWidget(QAbstractScrollArea):
             super().wheelEvent(event)
             
     def resizeEvent(self, event):
-        self.rebuild_layout()
+        if self.displaySettings.wordWrap:
+            self.relayout_for_width()
+        else:
+            self.update_offsets()
         self.update_scrollbar()
         self.viewport().update()
         
+    def memory_stats(self):
+        return {
+            "layout_lines": sum(entry.layout.lineCount() for entry in self.layout_lines if entry.layout is not None),
+            "layout_pending": sum(1 for entry in self.layout_lines if entry.layout is None),
+            "wrap_cache_widths": len(self.wrap_cache),
+            "path_bytes": sum(path.elementCount() for path in self.painted_paths.values()) * PATH_ELEMENT_BYTES,
+        }
+        
     def paintEvent(self, event):
         # print('re-paint',time.time())
+        t0 = time.perf_counter()
+        painted_paths = {}
         
         painter = QPainter(self.viewport())
         painter.setRenderHint(QPainter.Antialiasing)
         painter.setRenderHint(QPainter.TextAntialiasing)
 
         y_offset = self.verticalScrollBar().value()
-        painter.translate(0, -y_offset)
-
         x_offset = self.horizontalScrollBar().value()
         painter.translate(-x_offset, -y_offset)
         
-        for layout, _ in self.layout_lines:
+        # only paragraphs intersecting the exposed rect
+        margin = self.displaySettings.outlineSize + abs(self.displaySettings.lineSpace)
+        top = event.rect().top() + y_offset - margin
+        bottom = event.rect().bottom() + y_offset + margin
+        first = max(0, bisect_right(self.paragraph_y, top) - 1)
+        
+        for index in range(first, len(self.layout_lines)):
+            if self.paragraph_y[index] > bottom:
+                break
+            layout = self.layout_lines[index].layout
+            if layout is None:
+                continue
+            origin = QPointF(0, self.paragraph_y[index])
+            
             for i in range(layout.lineCount()):
 
                 line = layout.lineAt(i)
@@ -134,21 +484,33 @@ class OutlinedTextWidget(QAbstractScrollArea):
                 ############################################ opt1
                 
                 
-                x_cursor = pos.x() + self.displaySettings.outlineSize
-                baseline_y = pos.y() + layout.lineAt(i).ascent()
+                x_cursor = origin.x() + pos.x() + self.displaySettings.outlineSize
+                baseline_y = origin.y() + pos.y() + layout.lineAt(i).ascent()
                 
-                path = QPainterPath()
-                path.addText(QPointF(x_cursor, baseline_y), self.displaySettings.font, text)
-
-                painter.setPen(QPen(self.displaySettings.color2, self.displaySettings.outlineSize))
-                painter.setBrush(Qt.NoBrush)
-                painter.drawPath(path)
-
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(self.displaySettings.color1)
-                painter.drawPath(path)
+                styled = self.layout_lines[index].styled
+                start = line.textStart()
+                for seg_start, seg_end, style in styled.segments(start, start + line.textLength()):
+                    if style is None:
+                        font, fill, outline = self.displaySettings.font, self.displaySettings.color1, self.displaySettings.color2
+                    else:
+                        font, fill, outline = self.span_paint(style)
+                    seg_text = text[seg_start - start:seg_end - start]
+                    seg_x = x_cursor + (line.cursorToX(seg_start)[0] - line.cursorToX(start)[0] if seg_start > start else 0)
+                    
+                    path = self.caches.paths.get(font, seg_text)
+                    painted_paths[(font.key(), seg_text)] = path
+
+                    painter.save()
+                    painter.translate(seg_x, baseline_y)
+                    painter.setPen(QPen(outline, self.displaySettings.outlineSize))
+                    painter.setBrush(Qt.NoBrush)
+                    painter.drawPath(path)
+
+                    painter.setPen(Qt.NoPen)
+                    painter.setBrush(fill)
+                    painter.drawPath(path)
+                    painter.restore()
 
-                x_cursor += path.boundingRect().width()
                 
                 ############################################ opt2
 
@@ -204,7 +566,9 @@ class OutlinedTextWidget(QAbstractScrollArea):
 
                 #         x_cursor += path.boundingRect().width()
                         
-     
+        painter.end()
+        self.painted_paths = painted_paths
+        self.paint_stats.record(time.perf_counter() - t0)
                 
                 
     def mousePressEvent(self, event):
@@ -1,28 +1,39 @@
 
 from __future__ import annotations
+import time
 from PyQt5.QtWidgets import (
     QApplication,
     QTextEdit
 )
 from PyQt5.QtCore import Qt, QPoint
-from PyQt5.QtGui import QTextBlockFormat, QTextCursor
+from PyQt5.QtGui import QTextBlockFormat, QTextCursor, QTextCharFormat, QTextFormat, QColor, QFont
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import Qt
-from models import DisplaySettings
+from models import DisplaySettings, PaintStats
+from render_cache import SharedCaches
+from markup import parse_paragraph, needs_parsing, SpanStyle
+from text_model import replace_blocks
+
+# marks text in the overlay color, so a color change recolors it and not the ANSI/markup spans
+TEXT_COLOR_PROPERTY = QTextFormat.UserProperty + 1
 
 class DraggableTextEdit(QTextEdit):
     """Custom QTextEdit that allows dragging its parent when in edit mode."""
-    def __init__(self, parent=None, text="No text", displaySettings: DisplaySettings = None):
+    def __init__(self, parent=None, text="No text", displaySettings: DisplaySettings = None, caches: SharedCaches = None):
         super().__init__(parent)
         self.overlay_widget = parent
         self.displaySettings = displaySettings
+        self.caches = caches if caches is not None else SharedCaches()
+        self.paint_stats = PaintStats()
         self.dragging = False
         self.last_pos = QPoint()
-        self.setLineWrapMode(QTextEdit.NoWrap)
+        self.setLineWrapMode(QTextEdit.WidgetWidth if self.displaySettings.wordWrap else QTextEdit.NoWrap)
         
         self.setReadOnly(True)
-        self.ttext = text
-        QTextEdit.setText(self, text)
+        self.text_color = QColor(self.displaySettings.color1)
+        self.line_count = text.count("\n") + 1
+        QTextEdit.setPlainText(self, text)
+        self.format_plain_text()
         QTextEdit.setFont(self, self.displaySettings.font)
         QTextEdit.setTextColor(self, self.displaySettings.color1)
         
@@ -37,8 +48,11 @@ class DraggableTextEdit(QTextEdit):
         self.displaySettings = sett
         
     def updateFont(self):
+        self.setLineWrapMode(QTextEdit.WidgetWidth if self.displaySettings.wordWrap else QTextEdit.NoWrap)
         QTextEdit.setFont(self, self.displaySettings.font)
         QTextEdit.setTextColor(self, self.displaySettings.color1)
+        if self.text_color != self.displaySettings.color1:
+            self.recolor_text()
 
         print('ls:', self.displaySettings.lineSpace)
         block_format = QTextBlockFormat()
@@ -50,9 +64,119 @@ class DraggableTextEdit(QTextEdit):
         self.viewport().update()
         
     def setTYext(self, text):
-        self.ttext = text
-        QTextEdit.setText(self, text)
+        self.line_count = text.count("\n") + 1
+        if not needs_parsing(text, self.displaySettings.markup):
+            QTextEdit.setPlainText(self, text)
+            self.format_plain_text()
+            return
+        
+        self.clear()
+        self.insert_paragraphs(QTextCursor(self.document()), text.split("\n"))
+        
+    def set_paragraphs(self, paragraphs):
+        self.setTYext("\n".join(paragraphs))
+        
+    def insert_paragraphs(self, cursor: QTextCursor, paragraphs):
+        """Inserts paragraphs at the cursor with their ANSI/markup spans as char formats.
+        Plain text gets the base format, not the one of the text next to the cursor."""
+        base = self.base_format()
+        if not any(needs_parsing(paragraph, self.displaySettings.markup) for paragraph in paragraphs):
+            cursor.insertText("\n".join(paragraphs), base)
+            return
+        
+        for i, paragraph in enumerate(paragraphs):
+            if i:
+                cursor.insertBlock()
+            styled = parse_paragraph(paragraph, self.displaySettings.markup)
+            for start, end, style in styled.segments(0, len(styled.text)):
+                cursor.insertText(styled.text[start:end], base if style is None else self.span_format(base, style))
+                
+    def finish_layout(self):
+        # QTextDocument lays out on demand
+        pass
+        
+    def base_format(self):
+        base = QTextCharFormat()
+        base.setForeground(self.displaySettings.color1)
+        base.setProperty(TEXT_COLOR_PROPERTY, True)
+        return base
+        
+    def format_plain_text(self):
+        # one edit block, a document relayout per format change is what makes this slow
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        cursor.select(QTextCursor.Document)
+        cursor.setCharFormat(self.base_format())
+        cursor.endEditBlock()
+        self.text_color = QColor(self.displaySettings.color1)
+        
+    def recolor_text(self):
+        """Applies a new overlay color to the text that has no color of its own"""
+        # runs of such text, joined across line breaks, get one format change each
+        runs = []
+        block = self.document().begin()
+        while block.isValid():
+            fragments = block.begin()
+            while not fragments.atEnd():
+                fragment = fragments.fragment()
+                if fragment.charFormat().boolProperty(TEXT_COLOR_PROPERTY):
+                    start, end = fragment.position(), fragment.position() + fragment.length()
+                    if runs and runs[-1][1] >= start - 1:
+                        runs[-1][1] = end
+                    else:
+                        runs.append([start, end])
+                fragments += 1
+            block = block.next()
+
+        color_format = QTextCharFormat()
+        color_format.setForeground(self.displaySettings.color1)
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        for start, end in runs:
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.mergeCharFormat(color_format)
+        cursor.endEditBlock()
+        self.text_color = QColor(self.displaySettings.color1)
+        
+    def span_format(self, base: QTextCharFormat, style: SpanStyle):
+        span_format = QTextCharFormat(base)
+        if style.fg:
+            span_format.setForeground(QColor(style.fg))
+            span_format.clearProperty(TEXT_COLOR_PROPERTY)
+        if style.bold:
+            span_format.setFontWeight(QFont.Bold)
+        span_format.setFontItalic(style.italic)
+        span_format.setFontUnderline(style.underline)
+        return span_format
+        
+    def replace_paragraphs(self, start, count, new_paragraphs):
+        """Replaces blocks [start, start+count), the rest of the document is left untouched.
+        False when the blocks no longer match the lines, the caller then sets all paragraphs."""
+        document = self.document()
+        if document.blockCount() != self.line_count or start + count > self.line_count:
+            return False
+        replace_blocks(document, start, count, self.line_count, new_paragraphs, self.insert_paragraphs)
+        self.line_count += len(new_paragraphs) - count
+        return True
+        
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        if self.overlay_widget is not None:
+            self.overlay_widget.content_changed()
+        
+    def paintEvent(self, event):
+        t0 = time.perf_counter()
+        super().paintEvent(event)
+        self.paint_stats.record(time.perf_counter() - t0)
         
+    def memory_stats(self):
+        document = self.document()
+        return {
+            "layout_lines": document.lineCount(),
+            "document_chars": document.characterCount(),
+            "path_bytes": 0,
+        }
         
     def mousePressEvent(self, event):
         if self.overlay_widget and self.overlay_widget.edit_mode:
@@ -86,7 +210,7 @@ class DraggableTextEdit(QTextEdit):
             else:
                 fs = max(1, fs - 1)
 
-            self.displaySettings.font.setPointSize(fs)
+            self.displaySettings.font = self.caches.fonts.get(self.displaySettings.font.family(), fs, self.devicePixelRatioF())
 
             if self.overlay_widget is not None:
                 self.overlay_widget.donwstream_fontsize_update(fs)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+import os
+from models import ConfigProps
+from config import load_text, initDisplaySettings, overlay_configs, split_overlay_configs, DEFAULT_TEXT_FILE_PATH
+from render_cache import SharedCaches
+from file_watcher import FileWatcher, FileWatcherMultiplexer
+from update_scheduler import UpdateScheduler
+from text_model import TextModel
+from overlay.overlay_widget import OverlayWidget
+
+MISSING = object()
+
+
+class ManagedOverlay:
+    """One overlay definition from the config: its widget, text model and file watcher."""
+    def __init__(self, manager: OverlayManager, config, cli_overrides=None):
+        self.manager = manager
+        self.config = config
+        # command line flags show in the overlay, saving the config puts back what they replaced
+        self.cli_overrides = cli_overrides or {}
+        self.cli_replaced = {key: config.get(key, MISSING) for key in self.cli_overrides}
+        config.update(self.cli_overrides)
+
+        self.displaySettings = initDisplaySettings(config, manager.caches.fonts)
+        text = load_text(self.displaySettings.textFilePath)
+        self.model = TextModel(text)
+        self.model.changed.connect(self.on_model_changed)
+        self.widget = OverlayWidget(config, self.displaySettings, manager.caches, manager.updates, self.model)
+
+        self.watcher = FileWatcher("./"+DEFAULT_TEXT_FILE_PATH, self.on_file_updated, text, multiplexer=manager.watchers)
+        self.widget.set_settings_requested_callback(manager.request_settings)
+
+        self.frame_publisher = None
+        frame_output = config.get(ConfigProps.FRAME_OUTPUT.value)
+        if frame_output:
+            from frame_publisher import FramePublisher
+            self.frame_publisher = FramePublisher(frame_output)
+            self.widget.set_frame_listener(self.frame_publisher.schedule)
+
+    def start_watcher(self):
+        text_file_path = self.config.get(ConfigProps.TEXT_FILE_PATH.value, False)
+        if self.config.get(ConfigProps.WATCH_FILE.value, False) and text_file_path and not self.watcher.isRunning:
+            self.watcher.start(text_file_path)
+
+    def on_file_updated(self, new_text):
+        print("File changed!")
+        if new_text:
+            print('setting text')
+            self.widget.queue_text(new_text, "watcher")
+
+    def on_model_changed(self, start, removed, inserted):
+        if self.manager.settings is not None:
+            self.manager.settings.on_overlay_text_updated(self, start, removed, inserted)
+
+    def stats(self):
+        stats = self.widget.stats()
+        if self.frame_publisher is not None:
+            stats["frames"] = self.frame_publisher.stats()
+        return stats
+
+    def close(self):
+        self.watcher.stop()
+        self.manager.updates.cancel(self.widget)
+        if self.frame_publisher is not None:
+            self.widget.set_frame_listener(None)
+            self.frame_publisher.close()
+        self.widget.close()
+        self.widget.deleteLater()
+
+
+class OverlayManager:
+    """Hosts every overlay of the process with one file watcher and shared render caches."""
+    def __init__(self, config, start_watchers=True, record_path=None, cli_overrides=None, max_fps=None):
+        """cli_overrides maps an overlay index to the config values given as flags."""
+        self.config = config
+        self.settings = None
+        self.settings_requested_callback = None
+        self.caches = SharedCaches()
+        self.watchers = FileWatcherMultiplexer()
+        self.updates = UpdateScheduler(max_fps if max_fps is not None else config.get(ConfigProps.MAX_FPS.value, 0))
+
+        self.recorder = None
+        record_path = record_path or config.get(ConfigProps.RECORD_UPDATES.value)
+        if record_path:
+            from update_recorder import UpdateRecorder
+            self.recorder = UpdateRecorder(record_path)
+
+        cli_overrides = cli_overrides or {}
+        self.overlays = [
+            ManagedOverlay(self, overlay_config, cli_overrides.get(index))
+            for index, overlay_config in enumerate(overlay_configs(config))
+        ]
+        self.recorded_overlays = 0
+        for managed in self.overlays:
+            self.record_overlay(managed)
+        if start_watchers:
+            self.start_watchers()
+
+    def record_overlay(self, managed: ManagedOverlay):
+        # recording ids are never reused, even after an overlay is removed
+        if self.recorder is not None:
+            self.recorder.attach(managed.widget, self.recorded_overlays)
+            self.recorded_overlays += 1
+
+    def start_watchers(self):
+        for managed in self.overlays:
+            managed.start_watcher()
+
+    def set_settings_requested_callback(self, callback):
+        self.settings_requested_callback = callback
+
+    def prewarm_fonts(self):
+        for managed in self.overlays:
+            font = managed.displaySettings.font
+            self.caches.fonts.prewarm(font.family(), font.pointSize(), managed.widget.devicePixelRatioF())
+
+    def request_settings(self):
+        if self.settings_requested_callback:
+            self.settings_requested_callback()
+
+    def register_settings(self, sett: SettingsWindow):
+        self.settings = sett
+        for managed in self.overlays:
+            managed.widget.register_settings(sett)
+
+    def add_overlay(self, template: ManagedOverlay = None):
+        configs = split_overlay_configs(self.config)
+        # a legacy config was just moved into the list, so the first overlay's dict changed
+        if self.overlays and self.overlays[0].config is not configs[0]:
+            self.overlays[0].config = configs[0]
+
+        new_config = dict(template.config if template is not None else {})
+        # two publishers must not write the same file
+        new_config.pop(ConfigProps.FRAME_OUTPUT.value, None)
+        new_config.update({
+            ConfigProps.X.value: new_config.get(ConfigProps.X.value, 100) + 30,
+            ConfigProps.Y.value: new_config.get(ConfigProps.Y.value, 100) + 30,
+            ConfigProps.TEXT_FILE_PATH.value: self.new_text_file_path(configs),
+            ConfigProps.WATCH_FILE.value: False,
+        })
+        configs.append(new_config)
+
+        managed = ManagedOverlay(self, new_config)
+        self.record_overlay(managed)
+        managed.start_watcher()
+        if self.settings is not None:
+            managed.widget.register_settings(self.settings)
+        self.overlays.append(managed)
+        return managed
+
+    def saved_config(self):
+        """The config to save: values from command line flags are left out, unless they
+        were changed in the settings since."""
+        saved = dict(self.config)
+        if ConfigProps.OVERLAYS.value in saved:
+            saved[ConfigProps.OVERLAYS.value] = [dict(c) for c in saved[ConfigProps.OVERLAYS.value]]
+        for managed, overlay_config in zip(self.overlays, overlay_configs(saved)):
+            for key, value in managed.cli_overrides.items():
+                if overlay_config.get(key) != value:
+                    continue
+                if managed.cli_replaced[key] is MISSING:
+                    overlay_config.pop(key, None)
+                else:
+                    overlay_config[key] = managed.cli_replaced[key]
+        return saved
+
+    def new_text_file_path(self, configs):
+        """textN.txt for the next overlay, skipping names a configured overlay already reads"""
+        used = {os.path.normcase(os.path.normpath(c.get(ConfigProps.TEXT_FILE_PATH.value, DEFAULT_TEXT_FILE_PATH))) for c in configs}
+        number = len(configs) + 1
+        while os.path.normcase(os.path.normpath(f"text{number}.txt")) in used:
+            number += 1
+        return f"text{number}.txt"
+
+    def remove_overlay(self, managed: ManagedOverlay):
+        if len(self.overlays) <= 1 or managed not in self.overlays:
+            return False
+        self.overlays.remove(managed)
+        overlay_configs(self.config).remove(managed.config)
+        managed.close()
+        return True
+
+    def close_all(self):
+        for managed in self.overlays:
+            managed.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def stats(self):
+        return {
+            "overlays": [managed.stats() for managed in self.overlays],
+            "shared": self.caches.stats(),
+            "updates": self.updates.stats(),
+            "recording": self.recorder.stats() if self.recorder is not None else None,
+        }
+
+    def report(self):
+        stats = self.stats()
+        for i, overlay_stats in enumerate(stats["overlays"]):
+            print(f'Overlay {i + 1}:', overlay_stats)
+        print('Shared caches:', stats["shared"])
+        print('Updates:', stats["updates"])
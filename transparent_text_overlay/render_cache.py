@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from PyQt5.QtGui import QFont, QPainterPath
+from PyQt5.QtCore import QPointF
+from font_service import FontService
+
+# QPainterPath::Element is {qreal x, qreal y, ElementType type}
+PATH_ELEMENT_BYTES = 24
+
+
+class PathCache:
+    """LRU of text outlines at origin, keyed by font and text."""
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, font: QFont, text: str) -> QPainterPath:
+        key = (font.key(), text)
+        path = self.entries.get(key)
+        if path is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        path = QPainterPath()
+        path.addText(QPointF(0, 0), font, text)
+        self.entries[key] = path
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return path
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def bytes(self):
+        return sum(path.elementCount() for path in self.entries.values()) * PATH_ELEMENT_BYTES
+
+
+class SharedCaches:
+    """Caches shared by every overlay hosted in the process."""
+    def __init__(self):
+        self.fonts = FontService()
+        self.paths = PathCache()
+
+    def stats(self):
+        stats = self.fonts.stats()
+        stats.update({
+            "paths": len(self.paths.entries),
+            "path_hits": self.paths.hits,
+            "path_misses": self.paths.misses,
+            "path_bytes": self.paths.bytes,
+        })
+        return stats
@@ -0,0 +1,44 @@
+import sys
+import threading
+from collections import deque
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class StdinReader(QObject):
+    """Reads lines from stdin on a background thread and hands them to the GUI thread."""
+    line_received = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream if stream is not None else sys.stdin
+        self.thread = threading.Thread(target=self.run, name="StdinReader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        # readline instead of iterating, which would read ahead and delay lines
+        for line in iter(self.stream.readline, ''):
+            self.line_received.emit(line.rstrip('\r\n'))
+        self.finished.emit()
+
+
+class FollowBuffer:
+    """Keeps the last `tail` lines and pushes them to the overlay through its update
+    scheduler, once per frame however many lines arrived in between."""
+    def __init__(self, overlay, tail=0):
+        self.overlay = overlay
+        self.lines = deque(maxlen=tail if tail > 0 else None)
+        self.lines_received = 0
+        self.flushes = 0
+
+    def append(self, line):
+        self.lines.append(line)
+        self.lines_received += 1
+        # the lines are joined when the frame is applied, not per line
+        self.overlay.schedule_update(self.flush, "stdin")
+
+    def flush(self):
+        self.flushes += 1
+        self.overlay.setText("\n".join(self.lines), "stdin")
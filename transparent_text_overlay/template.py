@@ -0,0 +1,203 @@
+from __future__ import annotations
+import os
+import re
+import time
+from datetime import datetime
+from PyQt5.QtCore import QTimer
+
+# only known field names are placeholders, any other {...} stays literal text
+FIELD_PATTERN = re.compile(r"\{(time|elapsed|file)(?::([^{}]*))?\}")
+
+
+def single_line(value):
+    # a field must not add paragraphs, that would shift every index after it
+    return " ".join(str(value).splitlines())
+
+
+class Field:
+    """A placeholder inside one paragraph. interval_ms None means it only changes when told to."""
+    interval_ms = None
+
+    def __init__(self, engine: TemplateEngine, arg):
+        self.engine = engine
+        self.arg = arg
+        self.value = ""
+
+    def evaluate(self):
+        return ""
+
+    def refresh(self):
+        """Re-evaluates the field, True if the shown value changed."""
+        value = single_line(self.evaluate())
+        if value == self.value:
+            return False
+        self.value = value
+        return True
+
+
+class TimeField(Field):
+    def __init__(self, engine, arg):
+        super().__init__(engine, arg or "%H:%M:%S")
+        self.interval_ms = 100 if "%f" in self.arg else 1000
+
+    def evaluate(self):
+        return datetime.now().strftime(self.arg)
+
+
+class ElapsedField(Field):
+    interval_ms = 1000
+
+    def evaluate(self):
+        seconds = int(time.monotonic() - self.engine.started)
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class FileField(Field):
+    """Contents of a small file, re-read only when its mtime or size changes."""
+    interval_ms = 1000
+
+    def __init__(self, engine, arg):
+        super().__init__(engine, arg)
+        self.stamp = None
+        self.contents = ""
+
+    def evaluate(self):
+        try:
+            stat = os.stat(self.arg)
+        except OSError:
+            self.stamp = None
+            return f"[missing {self.arg}]"
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self.stamp:
+            self.stamp = stamp
+            try:
+                with open(self.arg, "r", encoding="utf-8") as f:
+                    self.contents = f.read().strip()
+            except Exception as e:
+                print(f"Template: Error reading {self.arg}: {e}")
+        return self.contents
+
+
+FIELD_TYPES = {
+    "time": TimeField,
+    "elapsed": ElapsedField,
+    "file": FileField,
+}
+
+
+class TemplateEngine:
+    """Parses overlay text once into static and dynamic spans per paragraph and keeps the
+    dynamic ones live. Fields with the same refresh interval share a timer; when fields
+    change only their paragraphs are reported through on_paragraphs_changed({index: text})."""
+    def __init__(self, on_paragraphs_changed=None):
+        self.on_paragraphs_changed = on_paragraphs_changed
+        self.started = time.monotonic()
+
+        self.paragraphs = []
+        self.fields = []
+        self.field_paragraph = {}
+        self.timers = {}
+
+    @property
+    def active(self):
+        return bool(self.fields)
+
+    def set_paragraphs(self, paragraphs):
+        """Parses template paragraphs and returns them rendered."""
+        self.stop()
+        self.paragraphs = []
+        self.fields = []
+        self.field_paragraph = {}
+        return self.replace_paragraphs(0, 0, paragraphs)
+
+    def replace_paragraphs(self, start, count, new_paragraphs):
+        """Replaces template paragraphs [start, start+count) and returns the new ones rendered.
+        Fields after them move along, timers are only touched when the intervals change."""
+        intervals = {field.interval_ms for field in self.fields if field.interval_ms}
+        delta = len(new_paragraphs) - count
+        if self.fields:
+            for field, index in list(self.field_paragraph.items()):
+                if start <= index < start + count:
+                    del self.field_paragraph[field]
+                elif index >= start + count:
+                    self.field_paragraph[field] = index + delta
+            self.fields = [field for field in self.fields if field in self.field_paragraph]
+
+        # text without "{" has no fields, it is kept and shown as it is
+        has_fields = any("{" in paragraph for paragraph in new_paragraphs)
+        if has_fields:
+            self.paragraphs[start:start + count] = [self.parse_paragraph(paragraph, start + i) for i, paragraph in enumerate(new_paragraphs)]
+        else:
+            self.paragraphs[start:start + count] = new_paragraphs
+
+        if self.timers and intervals != {field.interval_ms for field in self.fields if field.interval_ms}:
+            self.stop()
+            self.start()
+        elif not self.timers and self.fields:
+            self.start()
+        if not has_fields:
+            return list(new_paragraphs)
+        return [self.render_paragraph(index) for index in range(start, start + len(new_paragraphs))]
+
+    def parse_paragraph(self, paragraph, index):
+        """Static text and fields of one paragraph, the paragraph itself when it has no fields"""
+        if "{" not in paragraph:
+            return paragraph
+
+        spans = []
+        last = 0
+        for match in FIELD_PATTERN.finditer(paragraph):
+            if match.start() > last:
+                spans.append(paragraph[last:match.start()])
+            field = FIELD_TYPES[match.group(1)](self, match.group(2))
+            field.refresh()
+            spans.append(field)
+            self.fields.append(field)
+            self.field_paragraph[field] = index
+            last = match.end()
+        if not spans:
+            return paragraph
+        if last < len(paragraph):
+            spans.append(paragraph[last:])
+        return spans
+
+    def render_paragraph(self, index):
+        spans = self.paragraphs[index]
+        if isinstance(spans, str):
+            return spans
+        return "".join(span if isinstance(span, str) else span.value for span in spans)
+
+    def render(self):
+        if not self.fields:
+            return "\n".join(self.paragraphs)
+        return "\n".join(self.render_paragraph(index) for index in range(len(self.paragraphs)))
+
+    def start(self):
+        intervals = {field.interval_ms for field in self.fields if field.interval_ms}
+        for interval in intervals:
+            timer = QTimer()
+            timer.timeout.connect(lambda interval=interval: self.tick(interval))
+            self.timers[interval] = timer
+            # second-based fields flip right after the wall clock does
+            delay = interval - int(time.time() * 1000) % interval
+            QTimer.singleShot(delay, lambda timer=timer, interval=interval: self.start_timer(timer, interval))
+
+    def start_timer(self, timer, interval):
+        if self.timers.get(interval) is not timer:
+            return
+        self.tick(interval)
+        timer.start(interval)
+
+    def stop(self):
+        for timer in self.timers.values():
+            timer.stop()
+        self.timers = {}
+
+    def tick(self, interval):
+        self.refresh_fields([field for field in self.fields if field.interval_ms == interval])
+
+    def refresh_fields(self, fields):
+        changed = {self.field_paragraph[field] for field in fields if field.refresh()}
+        if changed and self.on_paragraphs_changed:
+            self.on_paragraphs_changed({index: self.render_paragraph(index) for index in sorted(changed)})
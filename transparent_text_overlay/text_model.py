@@ -0,0 +1,90 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+
+def common_prefix(a, b):
+    """Length of the common prefix of two strings or lists, compared in slices instead of
+    item by item."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def common_suffix(a, b, limit):
+    lo, hi = 0, min(len(a), len(b), limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def insert_lines(cursor: QTextCursor, lines):
+    cursor.insertText("\n".join(lines))
+
+def replace_blocks(document, start, count, line_count, lines, insert=insert_lines):
+    """Replaces blocks [start, start+count) of a document holding line_count lines, the
+    rest of the document is left untouched. insert(cursor, lines) writes the new lines."""
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+    if count:
+        first = document.findBlockByNumber(start)
+        last = document.findBlockByNumber(start + count - 1)
+        begin, end = first.position(), last.position() + last.length() - 1
+        if not lines:
+            # removed lines take one line break with them
+            if start + count < line_count:
+                end += 1
+            elif start > 0:
+                begin -= 1
+        cursor.setPosition(begin)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        if lines:
+            insert(cursor, lines)
+    elif lines:
+        if start < line_count:
+            cursor.setPosition(document.findBlockByNumber(start).position())
+            insert(cursor, lines)
+            cursor.insertBlock()
+        else:
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertBlock()
+            insert(cursor, lines)
+    cursor.endEditBlock()
+
+
+class TextModel(QObject):
+    """The text of one overlay as a list of lines, shared by its renderer, the settings
+    window and the file watcher. Every change bumps `version` and reports the changed
+    line range, so consumers compare versions and update ranges instead of whole strings."""
+    # first line, lines removed, lines inserted
+    changed = pyqtSignal(int, int, int)
+
+    def __init__(self, text=""):
+        super().__init__()
+        self.lines = text.split("\n")
+        self.version = 0
+
+    def text(self):
+        return "\n".join(self.lines)
+
+    def set_text(self, text):
+        """Replaces the text, reporting only the lines that differ. False if nothing did."""
+        lines = text.split("\n")
+        start = common_prefix(self.lines, lines)
+        end = common_suffix(self.lines, lines, min(len(self.lines), len(lines)) - start)
+        return self.replace_lines(start, len(self.lines) - start - end, lines[start:len(lines) - end])
+
+    def replace_lines(self, start, count, new_lines):
+        if not count and not new_lines:
+            return False
+        self.lines[start:start + count] = new_lines
+        self.version += 1
+        self.changed.emit(start, count, len(new_lines))
+        return True
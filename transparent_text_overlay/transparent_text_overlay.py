@@ -1,155 +1,131 @@
 from __future__ import annotations
+import time
+STARTUP_T0 = time.perf_counter()
 import sys
-import json
 import os
+import argparse
 from PyQt5.QtWidgets import (
     QApplication, QLabel, QWidget, QPushButton,
     QVBoxLayout, QHBoxLayout, QLineEdit, QCheckBox, QSpinBox,
-    QTextEdit, QSizeGrip, QColorDialog, QComboBox
+    QTextEdit, QColorDialog, QComboBox, QSystemTrayIcon, QMenu
 )
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QColor, QIcon
-from models import ConfigProps, DisplaySettings
-from overlay.sol_text_overlay import OutlinedTextWidget
-from overlay.text_overlay import DraggableTextEdit
-from file_watcher import FileWatcher
-
-CONFIG_FILE = "transparent_text_overlay_config.json"
-DEFAULT_TEXT_FILE_PATH = "text.txt"
-
-def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except:
-                return json.loads("{}F")
-    return {}
-
-def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
-        
-def load_text(path):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    return "No text loaded, use the settings window or put text to '"+path+"'"
-
-def save_text(content, path):
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QIcon
+from models import ConfigProps
+from config import load_config, save_config, save_text, initDisplaySettings
+from cli import add_overlay_arguments, selected_overlay_config, selected_overlay_index, cli_overrides
+from overlay_manager import OverlayManager, ManagedOverlay
+from text_model import replace_blocks
+from render_cache import SharedCaches
 
 class SettingsWindow(QWidget):
-    def __init__(self, overlay: OverlayWidget, config, displaySettings: DisplaySettings):
+    def __init__(self, manager: OverlayManager):
         super().__init__()
-        self.overlay = overlay
-        if not overlay:
+        self.manager = manager
+        if not manager.overlays:
             raise "No overlay provided"
-        
-        overlay.register_settings(self)
-        
-        self.displaySettings = displaySettings
+
+        manager.register_settings(self)
+
+        self.current = None
+        self.applying_text = False
+        self.overlay = None
+        self.displaySettings = None
+        self.config = None
 
         self.setWindowTitle("Overlay Settings")
-        self.config = config
-        
+
+        self.overlay_select = QComboBox()
+        self.overlay_select.currentIndexChanged.connect(self.select_overlay)
+
+        self.add_overlay_button = QPushButton("Add overlay", self)
+        self.add_overlay_button.clicked.connect(self.add_overlay)
+
+        self.remove_overlay_button = QPushButton("Remove overlay", self)
+        self.remove_overlay_button.clicked.connect(self.remove_overlay)
+
+        self.stats_button = QPushButton("Print stats", self)
+        self.stats_button.clicked.connect(self.manager.report)
+
         self.text_input = QTextEdit()
-        self.saved_text = load_text(self.displaySettings.textFilePath)
-        self.text_input.setPlainText(self.saved_text) 
-        self.text_input.setMinimumHeight(80) 
-          
-        self.overlay.setText(self.saved_text) 
-        
+        self.text_input.setMinimumHeight(80)
+
         self.x_input = QSpinBox()
         self.x_input.setRange(0, 3000)
         self.x_input.setPrefix("X: ")
-        self.x_input.setValue(self.displaySettings.x)
 
-            
         self.y_input = QSpinBox()
         self.y_input.setRange(0, 3000)
         self.y_input.setPrefix("Y: ")
-        self.y_input.setValue(self.displaySettings.y)
-        
+
         self.text_type_combobox = QComboBox()
         self.text_type_combobox.addItem('Simple')
         self.text_type_combobox.addItem("Outlined text (slow)")
-        self.text_type_combobox.setCurrentIndex(self.displaySettings.widgetType)
-        self.selected_text_type = self.displaySettings.widgetType
 
         self.outline_size_input = QSpinBox()
         self.outline_size_input.setRange(0, 50)
         self.outline_size_input.setPrefix("Outline size: ")
-        self.outline_size_input.setValue(self.displaySettings.outlineSize)
-        
+
+        self.word_wrap_checkbox = QCheckBox("Word wrap")
+        self.markup_checkbox = QCheckBox("Markup tags")
+
         self.font_name_input = QLineEdit()
-        self.font_name_input.setText(self.displaySettings.font.family())
-        
+
         self.font_size_input = QSpinBox()
         self.font_size_input.setRange(0, 300)
         self.font_size_input.setPrefix("Font Size: ")
-        self.font_size_input.setValue(self.displaySettings.font.pointSize())
-        
+
         self.line_space_input = QSpinBox()
         self.line_space_input.setRange(-50, 300)
         self.line_space_input.setPrefix("Linespace: ")
-        self.line_space_input.setValue(self.displaySettings.lineSpace)
-        
+
         self.color_button1 = QPushButton("Pick Color1", self)
         self.color_button1.clicked.connect(self.open_color_picker1)
         self.color_button1.resize(150, 40)
-        self.color_button1.setStyleSheet(f"""
-            QPushButton {{
-                border: 2px solid {self.displaySettings.color1.name()};
-                border-radius: 4px;
-            }}
-        """)
-        
+
         self.color_button2 = QPushButton("Pick Color2", self)
         self.color_button2.clicked.connect(self.open_color_picker2)
         self.color_button2.resize(150, 40)
-        self.color_button2.setStyleSheet(f"""
-            QPushButton {{
-                border: 2px solid {self.displaySettings.color2.name()};
-                border-radius: 4px;
-            }}
-        """)
 
-        
+
         self.drag_checkbox = QCheckBox("Draggable (transparent switch)")
-        self.drag_checkbox.setChecked(config.get(ConfigProps.DRAGGABLE.value, True)) 
         self.drag_checkbox.stateChanged.connect(self.drag_changed)
-        
+
         self.show_overlay_checkbox = QCheckBox("Show overlay")
-        self.show_overlay_checkbox.setChecked(True) 
         self.show_overlay_checkbox.stateChanged.connect(self.show_overlay_changed)
-        
+
         self.apply_button = QPushButton("Apply and save above settings")
         self.exit_button = QPushButton("Exit")
 
         self.filewatch_checkbox = QCheckBox("Current watch file")
-        self.filewatch_checkbox.setChecked(config.get(ConfigProps.WATCH_FILE.value, False)) 
         self.filewatch_checkbox.stateChanged.connect(self.filewatch_checkbox_changed)
-        
+
         self.filewatch_input = QLineEdit()
-        self.filewatch_input.setText(config.get(ConfigProps.TEXT_FILE_PATH.value, "text.txt"))
-        
+
         self.filewatch_apply_button = QPushButton("Change path", self)
         self.filewatch_apply_button.clicked.connect(self.filewatch_apply_button_func)
-        
+
         self.filewatch_saveback_checkbox = QCheckBox("Save back to file")
-        self.filewatch_saveback_checkbox.setChecked(config.get(ConfigProps.WATCH_FILE_SAVEBACK.value, False)) 
 
         layout = QVBoxLayout()
         layout.setContentsMargins(10, 10, 10, 10)
+
+        overlay_layout = QHBoxLayout()
+        overlay_layout.addWidget(self.overlay_select)
+        overlay_layout.addWidget(self.add_overlay_button)
+        overlay_layout.addWidget(self.remove_overlay_button)
+        overlay_layout.addWidget(self.stats_button)
+        layout.addLayout(overlay_layout)
+
         layout.addWidget(self.text_input)
-        
+
         coord_layout = QHBoxLayout()
         coord_layout.addWidget(self.x_input)
         coord_layout.addWidget(self.y_input)
         coord_layout.addWidget(self.text_type_combobox)
         coord_layout.addWidget(self.outline_size_input)
+        coord_layout.addWidget(self.word_wrap_checkbox)
+        coord_layout.addWidget(self.markup_checkbox)
         layout.addLayout(coord_layout)
 
         font_layout = QHBoxLayout()
@@ -157,23 +133,23 @@ class SettingsWindow(QWidget):
         font_layout.addWidget(self.font_size_input)
         font_layout.addWidget(self.line_space_input)
         layout.addLayout(font_layout)
-        
+
         font_layout.addWidget(self.color_button1)
         font_layout.addWidget(self.color_button2)
-        
+
         layout.addWidget(self.apply_button)
-        
+
         drag_layout = QHBoxLayout()
         drag_layout.addWidget(self.drag_checkbox)
-        
+
         self.drag_arrow = QLabel("<----- Move/resize overlay")
         self.drag_checkbox.setContentsMargins(0, 0, 0, 0)
         self.drag_arrow.setContentsMargins(0, 0, 0, 0)
         drag_layout.addWidget(self.drag_arrow)
         layout.addLayout(drag_layout)
-        
+
         layout.addWidget(self.show_overlay_checkbox)
-        
+
         layout.addWidget(self.exit_button)
 
         filewatch_layout = QHBoxLayout()
@@ -183,118 +159,209 @@ class SettingsWindow(QWidget):
         filewatch_layout.addWidget(self.filewatch_saveback_checkbox)
         layout.addLayout(filewatch_layout)
         self.setMinimumWidth(300)
- 
+
         self.setLayout(layout)
-        
+
         self.apply_button.clicked.connect(self.apply_settings)
         self.exit_button.clicked.connect(self.exit_all)
-        
-        self.overlay.set_position_changed_callback(self.update_coords_from_overlay)
+
+        for managed in self.manager.overlays:
+            self.connect_overlay(managed)
+        self.refresh_overlay_select(0)
+
         self.move(50, 50)
 
         self.show()
-        self.watcher = FileWatcher("./"+DEFAULT_TEXT_FILE_PATH, self.on_file_updated, self.saved_text)
-        
-        if self.filewatch_checkbox.isChecked() and config.get(ConfigProps.TEXT_FILE_PATH.value, False) and self.filewatch_input.text():
-            self.watcher.start(self.filewatch_input.text())
+
+    def connect_overlay(self, managed: ManagedOverlay):
+        managed.widget.set_position_changed_callback(lambda pos, m=managed: self.update_coords_from_overlay(pos, m))
+
+    def refresh_overlay_select(self, index):
+        self.overlay_select.blockSignals(True)
+        self.overlay_select.clear()
+        for i, managed in enumerate(self.manager.overlays):
+            self.overlay_select.addItem(f"Overlay {i + 1}: {managed.displaySettings.textFilePath}")
+        self.overlay_select.setCurrentIndex(index)
+        self.overlay_select.blockSignals(False)
+        self.remove_overlay_button.setEnabled(len(self.manager.overlays) > 1)
+        self.select_overlay(index)
+
+    def select_overlay(self, index):
+        if index < 0 or index >= len(self.manager.overlays):
+            return
+        self.current = self.manager.overlays[index]
+        self.overlay = self.current.widget
+        self.displaySettings = self.current.displaySettings
+        self.config = self.current.config
+        self.load_inputs()
+
+    def load_inputs(self):
+        """Shows the selected overlay's settings in the inputs."""
+        inputs = [self.text_type_combobox, self.drag_checkbox, self.show_overlay_checkbox, self.filewatch_checkbox]
+        for widget in inputs:
+            widget.blockSignals(True)
+
+        self.load_text_input()
+        self.x_input.setValue(self.displaySettings.x)
+        self.y_input.setValue(self.displaySettings.y)
+        self.text_type_combobox.setCurrentIndex(self.displaySettings.widgetType)
+        self.outline_size_input.setValue(self.displaySettings.outlineSize)
+        self.word_wrap_checkbox.setChecked(self.displaySettings.wordWrap)
+        self.markup_checkbox.setChecked(self.displaySettings.markup)
+        self.font_name_input.setText(self.displaySettings.font.family())
+        self.font_size_input.setValue(self.displaySettings.font.pointSize())
+        self.line_space_input.setValue(self.displaySettings.lineSpace)
+        self.update_color_buttons()
+
+        self.drag_checkbox.setChecked(self.overlay.edit_mode)
+        self.show_overlay_checkbox.setChecked(self.overlay.isVisible())
+        self.filewatch_checkbox.setChecked(self.current.watcher.isRunning)
+        self.filewatch_input.setText(self.config.get(ConfigProps.TEXT_FILE_PATH.value, "text.txt"))
+        self.filewatch_saveback_checkbox.setChecked(self.config.get(ConfigProps.WATCH_FILE_SAVEBACK.value, False))
+
+        for widget in inputs:
+            widget.blockSignals(False)
+
+    def update_color_buttons(self):
+        self.color_button1.setStyleSheet(f"""
+            QPushButton {{
+                border: 2px solid {self.displaySettings.color1.name()};
+                border-radius: 4px;
+            }}
+        """)
+        self.color_button2.setStyleSheet(f"""
+            QPushButton {{
+                border: 2px solid {self.displaySettings.color2.name()};
+                border-radius: 4px;
+            }}
+        """)
+
+    def add_overlay(self):
+        managed = self.manager.add_overlay(self.current)
+        self.connect_overlay(managed)
+        self.refresh_overlay_select(len(self.manager.overlays) - 1)
+
+    def remove_overlay(self):
+        if self.manager.remove_overlay(self.current):
+            self.refresh_overlay_select(0)
+            save_config(self.manager.saved_config())
 
     def open_color_picker1(self):
         color = QColorDialog.getColor(self.displaySettings.color1, self, "Select Color")
         if color.isValid():
             self.displaySettings.color1 = color
-            self.color_button1.setStyleSheet(f"""
-                QPushButton {{
-                    border: 2px solid {self.displaySettings.color1.name()};
-                    border-radius: 4px;
-                }}
-            """)
-    
+            self.update_color_buttons()
+
     def open_color_picker2(self):
         color = QColorDialog.getColor(self.displaySettings.color2, self, "Select Color")
         if color.isValid():
             self.displaySettings.color2 = color
-            self.color_button2.setStyleSheet(f"""
-                QPushButton {{
-                    border: 2px solid {self.displaySettings.color2.name()};
-                    border-radius: 4px;
-                }}
-            """)
-                    
-    def on_file_updated(self, new_text):
-        print("File changed!")
-        if new_text and new_text != self.saved_text:
-            print('setting text')
-            self.saved_text = new_text
-            self.text_input.setPlainText(self.saved_text) 
-            self.overlay.setText(self.saved_text) 
-                 
+            self.update_color_buttons()
+
+    def load_text_input(self):
+        self.text_input.setPlainText(self.current.model.text())
+        self.text_input.document().setModified(False)
+
+    def on_overlay_text_updated(self, managed: ManagedOverlay, start, removed, inserted):
+        # keeps edits not applied yet, and skips the echo of our own apply
+        if managed is self.current and not self.applying_text and not self.text_input.document().isModified():
+            self.replace_text_input_lines(start, removed, managed.model.lines[start:start + inserted])
+
+    def replace_text_input_lines(self, start, removed, lines):
+        """Replaces lines [start, start+removed) of the text input, the cursor and scroll
+        position elsewhere stay where they are."""
+        document = self.text_input.document()
+        line_count = len(self.current.model.lines) - len(lines) + removed
+        if document.blockCount() != line_count:
+            self.load_text_input()
+            return
+
+        replace_blocks(document, start, removed, line_count, lines)
+        document.setModified(False)
+
+    def apply_text(self, managed: ManagedOverlay, text):
+        self.applying_text = True
+        try:
+            managed.widget.setText(text, "settings")
+        finally:
+            self.applying_text = False
+
     def filewatch_checkbox_changed(self, state):
         if state == 2:
-            self.watcher.start(self.filewatch_input.text())
+            self.current.watcher.start(self.filewatch_input.text())
         else:
-            self.watcher.stop()
-            
+            self.current.watcher.stop()
+
     def filewatch_apply_button_func(self):
-        self.watcher.stop()
-        self.watcher.start(self.filewatch_input.text())
+        self.current.watcher.stop()
+        self.current.watcher.start(self.filewatch_input.text())
 
     def show_overlay_changed(self, state):
         if state == 2 and  not self.overlay.isVisible():
             self.overlay.show()
         else:
             self.overlay.hide()
-            
+
     def drag_changed(self, state):
         if state == 2:
             self.overlay.enter_edit_mode(True)
         else:
             self.overlay.enter_edit_mode(False)
 
-    def update_coords_from_overlay(self, pos):
+    def update_coords_from_overlay(self, pos, managed: ManagedOverlay):
+        if managed is not self.current:
+            return
         self.x_input.blockSignals(True)
         self.y_input.blockSignals(True)
         self.x_input.setValue(pos.x())
         self.y_input.setValue(pos.y())
         self.x_input.blockSignals(False)
         self.y_input.blockSignals(False)
-   
-    def donwstream_fontsize_update(self, fontsize):
-        self.font_size_input.setValue(fontsize)
-         
+
+    def donwstream_fontsize_update(self, fontsize, overlay=None):
+        if overlay is None or overlay is self.overlay:
+            self.font_size_input.setValue(fontsize)
+
     def apply_settings(self):
         if self.text_type_combobox.currentIndex() != self.displaySettings.widgetType:
             self.displaySettings.widgetType = self.text_type_combobox.currentIndex() if self.text_type_combobox.currentIndex() in [0,1] else 0
             self.overlay.change_widget_type(self.displaySettings.widgetType)
 
-        new_text = self.text_input.toPlainText()
-        if new_text is None:
-            new_text = ""
-        
-        if new_text != self.saved_text:
+        if self.text_input.document().isModified():
+            new_text = self.text_input.toPlainText()
             print('setting new text')
-            self.overlay.setText(new_text)
-            self.saved_text = new_text
-            
+            self.overlay.schedule_update(lambda managed=self.current, text=new_text: self.apply_text(managed, text), "settings")
+            self.text_input.document().setModified(False)
+
             if self.filewatch_saveback_checkbox.isChecked():
                 print('saving new text to file '+self.displaySettings.textFilePath)
-                self.watcher.pause()
+                watcher = self.current.watcher
+                watcher.pause()
                 save_text(new_text, self.displaySettings.textFilePath)
-                QTimer.singleShot(2000, self.watcher.resume)
-                
+                QTimer.singleShot(2000, watcher.resume)
+
             # save_text(new_text, self.displaySettings.textFilePath)
 
         font_name = self.font_name_input.text()
         font_size = self.font_size_input.value()
         line_space = self.line_space_input.value()
-        self.displaySettings.font = QFont(font_name, font_size)
+        fonts = self.manager.caches.fonts
+        self.font_name_input.setStyleSheet("" if fonts.is_known_family(font_name) else "border: 1px solid red;")
+        self.font_name_input.setToolTip("" if fonts.is_known_family(font_name) else f"Font not found, using {fonts.resolve_family(font_name)}")
+        self.displaySettings.font = fonts.get(font_name, font_size, self.overlay.devicePixelRatioF())
         self.displaySettings.lineSpace = line_space
-        
+
         self.displaySettings.outlineSize = self.outline_size_input.value()
+        self.displaySettings.wordWrap = self.word_wrap_checkbox.isChecked()
+        markup_changed = self.markup_checkbox.isChecked() != self.displaySettings.markup
+        self.displaySettings.markup = self.markup_checkbox.isChecked()
 
         self.displaySettings.x = self.x_input.value()
         self.displaySettings.y = self.y_input.value()
         self.overlay.move(self.displaySettings.x, self.displaySettings.y)
 
+        if markup_changed:
+            self.overlay.refresh_text()
         self.overlay.updateFontR()
         draggable = self.drag_checkbox.isChecked()
 
@@ -305,8 +372,6 @@ class SettingsWindow(QWidget):
             ConfigProps.W.value: self.displaySettings.w,
             ConfigProps.H.value: self.displaySettings.h,
             ConfigProps.DRAGGABLE.value: draggable,
-            "settings_x": self.pos().x(),
-            "settings_y": self.pos().y(),
             ConfigProps.FONT_NAME.value: font_name,
             ConfigProps.FONT_SIZE.value: font_size,
             ConfigProps.COLOR1.value: self.displaySettings.color1.name(),
@@ -316,157 +381,158 @@ class SettingsWindow(QWidget):
             ConfigProps.WATCH_FILE.value: self.filewatch_checkbox.isChecked(),
             ConfigProps.TEXT_OVERLAY_TYPE.value: self.displaySettings.widgetType,
             ConfigProps.OUTLINE_SIZE.value: self.displaySettings.outlineSize,
+            ConfigProps.WORD_WRAP.value: self.displaySettings.wordWrap,
+            ConfigProps.MARKUP.value: self.displaySettings.markup,
             ConfigProps.WATCH_FILE_SAVEBACK.value: self.filewatch_saveback_checkbox.isChecked(),
         })
-        save_config(self.config)
+        self.manager.config.update({
+            "settings_x": self.pos().x(),
+            "settings_y": self.pos().y(),
+        })
+        save_config(self.manager.saved_config())
 
     def exit_all(self):
-        self.overlay.close()
+        self.manager.close_all()
         self.close()
+        QApplication.quit()
 
 
-class OverlayWidget(QWidget):
-    def __init__(self, config, displaySettings: DisplaySettings):
-        super().__init__()
-        self.displaySettings = displaySettings
-        self.settings = None
-        self.edit_mode = config.get(ConfigProps.DRAGGABLE.value, True)
-
-        self.text_widget_type = self.displaySettings.widgetType
-        self.text_font = self.displaySettings.font
-        
-        print('twt', self.text_widget_type)
-        if self.text_widget_type == 0:
-            self.text_edit = DraggableTextEdit(self, "No text", self.displaySettings)
-        elif self.text_widget_type == 1:
-            self.text_edit = OutlinedTextWidget(self, "No text", self.displaySettings)
-        else:
-            self.text_edit = DraggableTextEdit(self, "No text", self.displaySettings)
-            
-        
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        self.setWindowFlags(self.windowFlags() | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
-        
-        self.size_grip = QSizeGrip(self)
-
-        self.mylayout = QVBoxLayout()
-        self.mylayout.setContentsMargins(10, 10, 10, 10)
-        self.mylayout.addWidget(self.text_edit)
-        self.mylayout.addWidget(self.size_grip, 0, Qt.AlignBottom | Qt.AlignRight)
-        self.setLayout(self.mylayout)
-        
-        if self.edit_mode:
-            self.setWindowFlag(Qt.WindowTransparentForInput, False)
-            self.setStyleSheet("background-color: rgba(40, 40, 40, 200); border: 2px solid red;")
-            self.text_edit.setStyleSheet("background-color: rgba(0, 0, 0, 50); border: 2px dashed red")
-            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        else:
-            self.setWindowFlag(Qt.WindowTransparentForInput, True)
-            self.setStyleSheet("background-color: transparent;")
-            self.text_edit.setStyleSheet("background-color: transparent; border: none;")
-            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-            
-        self.text_edit.setEnabled(self.edit_mode) 
-
-        if self.displaySettings.w is not None and self.displaySettings.h is not None:
-            self.resize(displaySettings.w, displaySettings.h)
-        if self.displaySettings.x is not None and self.displaySettings.y is not None:
-            self.move(displaySettings.x, displaySettings.y)
-
-        self.position_changed_callback = None
-        self.show()
-            
-    def register_settings(self, sett: SettingsWindow):
-        self.settings = sett
-     
-    def set_display_settingsR(self, sett: DisplaySettings):
-        self.displaySettings = sett
-        self.text_edit.set_display_settings(sett)
-           
-    def change_widget_type(self, new_val):
-        if new_val == self.text_widget_type:
+class OverlayApplication:
+    """Puts the overlays on screen first. With lazy startup the file watchers and tray icon
+    are set up after the first frame and the settings window is built on demand."""
+    def __init__(self, config, lazy=True, record_path=None, cli_overrides=None, max_fps=None):
+        self.config = config
+        self.lazy = lazy
+        self.settings_window = None
+        self.tray = None
+
+        self.manager = OverlayManager(config, start_watchers=not lazy, record_path=record_path, cli_overrides=cli_overrides, max_fps=max_fps)
+        self.manager.set_settings_requested_callback(self.show_settings)
+        print(f'Startup: overlays created after {self.elapsed_ms():.1f} ms')
+
+        self.manager.overlays[0].widget.first_paint_callback = self.on_first_frame
+        if not lazy:
+            self.show_settings()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - STARTUP_T0) * 1000
+
+    def on_first_frame(self, overlay):
+        print(f'Startup: first overlay frame after {self.elapsed_ms():.1f} ms ({"lazy" if self.lazy else "eager"})')
+        if self.lazy:
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        self.manager.start_watchers()
+        self.manager.prewarm_fonts()
+        self.create_tray()
+
+        if self.config.get(ConfigProps.SHOW_SETTINGS_ON_START.value, True) or self.tray is None:
+            self.show_settings()
+        print(f'Startup: finished after {self.elapsed_ms():.1f} ms')
+
+    def create_tray(self):
+        if not QSystemTrayIcon.isSystemTrayAvailable():
             return
-        print(f'changing from {self.text_widget_type} to {new_val}')
-        self.text_widget_type = new_val
-        
-        self.mylayout.removeWidget(self.text_edit)
-        self.text_edit.deleteLater()
-        
-        new_widget = OutlinedTextWidget(self, self.text, self.displaySettings) if self.text_widget_type == 1 else DraggableTextEdit(self, self.text, self.displaySettings)
-        self.mylayout.insertWidget(0, new_widget)
-        self.text_edit = new_widget
-        
-        self.setText(self.text)        
-        
-    def donwstream_fontsize_update(self, fontsize):
-        self.settings.donwstream_fontsize_update(fontsize)
-        
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        new_size = self.size()
-        
-        self.displaySettings.w = new_size.width()
-        self.displaySettings.h = new_size.height()
-        
-            
-    def set_position_changed_callback(self, callback):
-        self.position_changed_callback = callback
-
-    def enter_edit_mode(self, enabled: bool):
-        # scroll_pos = self.text_edit.verticalScrollBar().value()
-        self.edit_mode = enabled
-        geometry = self.geometry()
-        self.hide()
-        
-        if enabled:
-            self.setWindowFlag(Qt.WindowTransparentForInput, False)
-        else:
-            self.setWindowFlag(Qt.WindowTransparentForInput, True)
-        self.setGeometry(geometry)
-        self.show()
-        print('edit mode', enabled)
-        
-        self.text_edit.setEnabled(enabled)
-  
-        if enabled:
-            self.setStyleSheet("background-color: rgba(40, 40, 40, 200); border: 2px solid red;")
-            self.text_edit.setStyleSheet("background-color: rgba(0, 0, 0, 50); border: 2px dashed red")
-            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        else:
-            self.setStyleSheet("background-color: transparent;")
-            self.text_edit.setStyleSheet("background-color: transparent; border: none; margin: 2px")
-            self.text_edit.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-            self.text_edit.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
-        self.adjustSize()
-
-        self.setGeometry(geometry)
-
-    def updateFontR(self):
-        self.text_edit.updateFont()
-    
-    def setText(self, content):
-        self.text = content
-        self.text_edit.setTYext(content)
-        self.text_edit.updateFont()
-
-def initDisplaySettings(config):
-    displaySettings = DisplaySettings()
-    displaySettings.color1 = QColor(config.get(ConfigProps.COLOR1.value, "white"))
-    displaySettings.color2 = QColor(config.get(ConfigProps.COLOR2.value, "black"))
-    displaySettings.font = QFont(config.get(ConfigProps.FONT_NAME.value, "Arial"), config.get(ConfigProps.FONT_SIZE.value, 16))
-    displaySettings.lineSpace = config.get(ConfigProps.LINE_SPACE.value, 5)
-    displaySettings.x = config.get(ConfigProps.X.value, 100)
-    displaySettings.y = config.get(ConfigProps.Y.value, 100)
-    displaySettings.w = config.get(ConfigProps.W.value, 200)
-    displaySettings.h = config.get(ConfigProps.H.value, 600)
-    displaySettings.widgetType = config.get(ConfigProps.TEXT_OVERLAY_TYPE.value, 0)
-    displaySettings.outlineSize = config.get(ConfigProps.OUTLINE_SIZE.value, 2)
-    displaySettings.textFilePath = config.get(ConfigProps.TEXT_FILE_PATH.value, DEFAULT_TEXT_FILE_PATH)
-    return displaySettings
+
+        self.tray = QSystemTrayIcon(QApplication.windowIcon())
+        self.tray.setToolTip("Transparent Text Overlay")
+
+        menu = QMenu()
+        menu.addAction("Settings", self.show_settings)
+        menu.addAction("Print stats", self.manager.report)
+        menu.addAction("Exit", self.exit_all)
+        self.tray.setContextMenu(menu)
+        self.tray_menu = menu
+
+        self.tray.activated.connect(self.on_tray_activated)
+        self.tray.show()
+        QApplication.instance().setQuitOnLastWindowClosed(False)
+
+    def on_tray_activated(self, reason):
+        if reason == QSystemTrayIcon.Trigger:
+            self.show_settings()
+
+    def show_settings(self):
+        if self.settings_window is None:
+            self.settings_window = SettingsWindow(self.manager)
+            print(f'Startup: settings window built after {self.elapsed_ms():.1f} ms')
+        self.settings_window.show()
+        self.settings_window.raise_()
+        self.settings_window.activateWindow()
+
+    def exit_all(self):
+        self.manager.close_all()
+        if self.settings_window is not None:
+            self.settings_window.close()
+        QApplication.quit()
+
+
+class FollowApplication:
+    """Overlay-only mode fed from stdin: no settings window, no text file, no watcher."""
+    def __init__(self, overlay_config, args, max_fps=0):
+        from overlay.overlay_widget import OverlayWidget
+        from stdin_reader import StdinReader, FollowBuffer
+        from update_scheduler import UpdateScheduler
+
+        self.args = args
+        self.caches = SharedCaches()
+        self.updates = UpdateScheduler(max_fps)
+        self.displaySettings = initDisplaySettings(overlay_config, self.caches.fonts)
+        self.overlay = OverlayWidget(overlay_config, self.displaySettings, self.caches, self.updates)
+        self.overlay.setText("")
+        self.recorder = None
+        if args.record:
+            from update_recorder import UpdateRecorder
+            self.recorder = UpdateRecorder(args.record)
+            self.recorder.attach(self.overlay, 0)
+        font = self.displaySettings.font
+        QTimer.singleShot(0, lambda: self.caches.fonts.prewarm(font.family(), font.pointSize(), self.overlay.devicePixelRatioF()))
+
+        self.frame_publisher = None
+        frame_output = overlay_config.get(ConfigProps.FRAME_OUTPUT.value)
+        if frame_output:
+            from frame_publisher import FramePublisher
+            self.frame_publisher = FramePublisher(frame_output)
+            self.overlay.set_frame_listener(self.frame_publisher.schedule)
+
+        self.buffer = FollowBuffer(self.overlay, args.tail)
+        self.reader = StdinReader()
+        self.reader.line_received.connect(self.buffer.append)
+        self.reader.finished.connect(self.on_eof)
+        self.reader.start()
+
+    def on_eof(self):
+        self.updates.flush()
+        print(f'stdin closed after {self.buffer.lines_received} lines, {self.buffer.flushes} overlay updates', file=sys.stderr)
+        if self.args.exit_on_eof:
+            # let the last flush paint before leaving
+            QTimer.singleShot(0, self.quit)
+
+    def quit(self):
+        if self.args.stats:
+            print(self.overlay.stats(), file=sys.stderr)
+            print(self.updates.stats(), file=sys.stderr)
+            if self.frame_publisher is not None:
+                print(self.frame_publisher.stats(), file=sys.stderr)
+        if self.recorder is not None:
+            self.recorder.close()
+        QApplication.quit()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Transparent text overlay")
+    add_overlay_arguments(parser)
+    parser.add_argument("--overlay-only", action="store_true", help="no settings window")
+    parser.add_argument("--follow", action="store_true", help="stream overlay text from stdin (implies --overlay-only)")
+    parser.add_argument("--tail", type=int, default=0, help="with --follow, keep only the last N lines")
+    parser.add_argument("--exit-on-eof", action="store_true", help="with --follow, quit when stdin closes")
+    parser.add_argument("--stats", action="store_true", help="with --follow, print overlay stats on exit")
+    parser.add_argument("--max-fps", type=float, help="apply text updates at most this often (default: screen refresh rate)")
+    parser.add_argument("--record", metavar="PATH", help="record text updates for update_recorder.py to replay")
+    # unknown arguments are left for Qt (-platform, -style, ...)
+    args, _ = parser.parse_known_args(argv)
+    return args
 
 def resource_path(relative_path):
     try:
@@ -476,14 +542,23 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
     app = QApplication(sys.argv)
     icon_path = resource_path("icon.ico")
     app.setWindowIcon(QIcon(icon_path))
-    
+
     config = load_config()
-    
-    ds = initDisplaySettings(config)
-    
-    overlay_window = OverlayWidget(config, ds)
-    settings_window = SettingsWindow(overlay_window, config, ds)
+    # flags apply to this run only, the config saved from the settings window stays as loaded
+    overlay_config = selected_overlay_config(config, args)
+    max_fps = args.max_fps if args.max_fps is not None else config.get(ConfigProps.MAX_FPS.value, 0)
+
+    if args.follow:
+        overlay_app = FollowApplication(overlay_config, args, max_fps)
+    elif args.overlay_only:
+        overlay_app = OverlayManager({ConfigProps.OVERLAYS.value: [overlay_config], ConfigProps.MAX_FPS.value: max_fps}, record_path=args.record)
+    else:
+        overlay_app = OverlayApplication(
+            config, lazy=config.get(ConfigProps.LAZY_STARTUP.value, True), record_path=args.record,
+            cli_overrides={selected_overlay_index(config, args): cli_overrides(args)}, max_fps=max_fps,
+        )
     sys.exit(app.exec_())
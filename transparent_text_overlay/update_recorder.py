@@ -0,0 +1,191 @@
+"""Records the text updates reaching overlays and replays them against headless overlays,
+so update patterns that stutter can be captured once and measured again after changes.
+
+Recording, JSONL, one object per line:
+    {"v": 1, "start": <unix time>}                          header
+    {"t": 1.25, "src": "watcher", "ov": 0, "p": 120, "s": 8, "i": "new text"}
+t is seconds since the header, ov the overlay index. An update keeps the first p and the
+last s characters of the overlay's previous text and puts i between them.
+
+    python update_recorder.py session.jsonl                 original speed
+    python update_recorder.py session.jsonl --fast --widget-type 1
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import argparse
+from text_model import common_prefix, common_suffix
+
+FORMAT_VERSION = 1
+
+
+def text_delta(old, new):
+    """(prefix, suffix, inserted) turning old into new"""
+    prefix = common_prefix(old, new)
+    suffix = common_suffix(old, new, min(len(old), len(new)) - prefix)
+    return prefix, suffix, new[prefix:len(new) - suffix]
+
+def apply_delta(old, prefix, suffix, inserted):
+    return old[:prefix] + inserted + old[len(old) - suffix:]
+
+
+class UpdateRecorder:
+    """Appends every setText of the attached overlays to a recording."""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+        self.t0 = time.perf_counter()
+        self.recorded = 0
+        self.bytes = 0
+        self.write({"v": FORMAT_VERSION, "start": time.time()})
+
+    def attach(self, overlay, overlay_id):
+        """Starts recording an overlay, with its current text as the first update."""
+        overlay.set_recorder(self, overlay_id)
+        self.record(overlay_id, "", overlay.text, "initial")
+
+    def record(self, overlay_id, old, new, source):
+        prefix, suffix, inserted = text_delta(old, new)
+        self.write({
+            "t": round(time.perf_counter() - self.t0, 4), "src": source, "ov": overlay_id,
+            "p": prefix, "s": suffix, "i": inserted,
+        })
+        self.recorded += 1
+
+    def write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self.file.write(line)
+        self.bytes += len(line)
+
+    def close(self):
+        self.file.close()
+
+    def stats(self):
+        return {"recorded": self.recorded, "recording_bytes": self.bytes}
+
+
+def recorded_overlays(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return sorted({entry["ov"] for entry in map(json.loads, f) if "ov" in entry})
+
+def read_recording(path):
+    """Yields (t, source, overlay id, full text) per update, holding one text per overlay."""
+    texts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if "v" in entry:
+                # appended sessions start over
+                texts = {}
+                continue
+            overlay_id = entry["ov"]
+            text = apply_delta(texts.get(overlay_id, ""), entry["p"], entry["s"], entry["i"])
+            texts[overlay_id] = text
+            yield entry["t"], entry["src"], overlay_id, text
+
+
+class Replayer:
+    """Feeds a recording to headless overlays, at the recorded pace through an update
+    scheduler like the app does, or as fast as possible with a paint after each update."""
+    def __init__(self, path, args):
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import Qt, QTimer
+        from models import ConfigProps
+        from config import load_config, initDisplaySettings, overlay_configs
+        from cli import apply_cli_overrides
+        from render_cache import SharedCaches
+        from update_scheduler import UpdateScheduler
+        from overlay.overlay_widget import OverlayWidget
+
+        self.app = QApplication.instance() or QApplication(["update_recorder"])
+        self.path = path
+        self.fast = args.fast
+        self.caches = SharedCaches()
+        self.scheduler = None if args.fast else UpdateScheduler(args.max_fps or 0)
+        self.replayed = 0
+
+        configs = overlay_configs(load_config())
+        self.overlays = {}
+        for overlay_id in recorded_overlays(path):
+            overlay_config = dict(configs[overlay_id] if overlay_id < len(configs) else {})
+            overlay_config[ConfigProps.DRAGGABLE.value] = False
+            apply_cli_overrides(overlay_config, args)
+            displaySettings = initDisplaySettings(overlay_config, self.caches.fonts)
+            self.overlays[overlay_id] = OverlayWidget(overlay_config, displaySettings, self.caches, self.scheduler)
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.replay_due)
+
+    def run(self):
+        self.t0 = time.perf_counter()
+        self.recording = read_recording(self.path)
+        if self.fast:
+            # the overlays paint only once their windows are exposed
+            self.app.processEvents()
+            for _, source, overlay_id, text in self.recording:
+                overlay = self.overlays[overlay_id]
+                overlay.setText(text, source)
+                # long texts are laid out in slices that need event loop turns
+                overlay.text_edit.finish_layout()
+                overlay.repaint()
+                self.replayed += 1
+        else:
+            self.next_update = next(self.recording, None)
+            self.replay_due()
+            self.app.exec_()
+        return time.perf_counter() - self.t0
+
+    def replay_due(self):
+        """Queues every update whose recorded time has come, then waits for the next one."""
+        elapsed = time.perf_counter() - self.t0
+        while self.next_update is not None and self.next_update[0] <= elapsed:
+            _, source, overlay_id, text = self.next_update
+            self.overlays[overlay_id].queue_text(text, source)
+            self.replayed += 1
+            self.next_update = next(self.recording, None)
+
+        if self.next_update is None:
+            from PyQt5.QtCore import QTimer
+            # let the last update get painted
+            self.scheduler.flush()
+            QTimer.singleShot(200, self.app.quit)
+            return
+        self.timer.start(max(0, int((self.next_update[0] - elapsed) * 1000)))
+
+    def report(self, elapsed):
+        print(f"Replayed {self.replayed} updates in {elapsed:.2f} s ({'fast' if self.fast else 'recorded pace'})")
+        for overlay_id, overlay in self.overlays.items():
+            print(f"Overlay {overlay_id + 1}:", overlay.stats())
+        print("Shared caches:", self.caches.stats())
+        if self.scheduler is not None:
+            print("Updates:", self.scheduler.stats())
+
+
+def parse_args(argv):
+    from cli import add_overlay_arguments
+
+    parser = argparse.ArgumentParser(description="Replay a recording of overlay updates headless")
+    parser.add_argument("recording", help="file written with --record")
+    parser.add_argument("--fast", action="store_true", help="as fast as possible instead of the recorded pace")
+    parser.add_argument("--max-fps", type=float, help="update scheduler rate at the recorded pace")
+    add_overlay_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    if not recorded_overlays(args.recording):
+        print(f"No updates in {args.recording}")
+        return 1
+
+    replayer = Replayer(args.recording, args)
+    replayer.report(replayer.run())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+import math
+import time
+from collections import Counter, OrderedDict
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QGuiApplication
+from models import PaintStats
+
+DEFAULT_FPS = 60
+
+
+class UpdateScheduler:
+    """Applies text updates from every source (file watcher, settings window, stdin) at most
+    once per frame interval. Updates are keyed by their target, a newer update replaces the
+    pending one for the same target, so intermediate states are dropped under load."""
+    def __init__(self, max_fps=0):
+        # 0 follows the refresh rate of the primary screen
+        self.max_fps = max_fps
+        self.pending = OrderedDict()
+        self.next_frame = 0.0
+        self.applied = Counter()
+        self.dropped = Counter()
+        self.apply_stats = PaintStats()
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.flush)
+
+    def frame_interval(self):
+        fps = self.max_fps
+        if not fps:
+            screen = QGuiApplication.primaryScreen()
+            fps = screen.refreshRate() if screen is not None else DEFAULT_FPS
+        return 1.0 / max(1.0, fps or DEFAULT_FPS)
+
+    def schedule(self, key, callback, source="api"):
+        if key in self.pending:
+            self.dropped[self.pending[key][1]] += 1
+        self.pending[key] = (callback, source)
+        if not self.timer.isActive():
+            delay = max(0.0, self.next_frame - time.perf_counter())
+            self.timer.start(math.ceil(delay * 1000))
+
+    def cancel(self, key):
+        self.pending.pop(key, None)
+
+    def flush(self):
+        """Applies everything pending now."""
+        self.timer.stop()
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, OrderedDict()
+
+        t0 = time.perf_counter()
+        for callback, source in pending.values():
+            callback()
+            self.applied[source] += 1
+        t1 = time.perf_counter()
+        self.apply_stats.record(t1 - t0)
+
+        # one frame interval between flushes at the least, and when a flush takes longer
+        # than that, as much idle time as it was busy so the GUI thread is never saturated
+        self.next_frame = max(t0 + self.frame_interval(), t1 + (t1 - t0))
+        if self.pending:
+            self.timer.start(math.ceil((self.next_frame - t1) * 1000))
+
+    def stats(self):
+        return {
+            "updates_applied": sum(self.applied.values()),
+            "updates_dropped": sum(self.dropped.values()),
+            "applied_by_source": dict(self.applied),
+            "dropped_by_source": dict(self.dropped),
+            "update_avg_ms": round(self.apply_stats.avg_ms, 3),
+            "update_max_ms": round(self.apply_stats.max_ms, 3),
+            "frame_interval_ms": round(self.frame_interval() * 1000, 2),
+        }